@@ -0,0 +1,158 @@
+import pandas as pd
+import profiler
+import receipts
+
+# Basket Configuration - The default "Döner Index" basket (item_name_en -> quantity per basket)
+DEFAULT_BASKET = {
+    'MINCED MEAT': 1.0,
+    'LEEK ONIONS': 1.0,
+    'GARLIC': 1.0,
+    'MULTIGRAIN BAGELS': 1.0,
+    'GOUDA CHEESE 48%': 0.5,
+}
+
+
+class BasketEngine:
+    """
+    Computes the cost of a weighted basket of items per supermarket over the full receipt history.
+
+    Prices are pivoted into a day x (supermarket, item) table, forward-filled with the last known
+    price and multiplied by the basket weights in one vectorized step. The filled price table and the
+    resulting cost table are kept in memory, so update() only recomputes days from the first new receipt on.
+    """
+
+    def __init__(self, weights=None):
+        self.weights = pd.Series(weights or DEFAULT_BASKET, dtype=float)
+        self._observed = pd.DataFrame()  # Last observed price per day, NaN where nothing was bought
+        self._filled = pd.DataFrame()    # Forward-filled version of _observed
+        self._cost = pd.DataFrame()      # Basket cost per day (index) and supermarket (columns)
+
+    @property
+    def items(self):
+        return list(self.weights.index)
+
+    def _daily_prices(self, df):
+        """Reduces raw receipts to the last price paid per (day, supermarket, item)."""
+        df = df[df['item_name_en'].isin(self.weights.index)]
+        if df.empty:
+            return pd.DataFrame()
+        frame = pd.DataFrame({
+            'day': receipts.dates(df),
+            'supermarket': df['supermarket'].to_numpy(),
+            'item': df['item_name_en'].to_numpy(),
+            'price': df['price'].astype(float).to_numpy(),
+        })
+        # Within a day keep the last receipt (receipts arrive ordered by id)
+        daily = frame.groupby(['day', 'supermarket', 'item'], sort=True)['price'].last()
+        return daily.unstack(['supermarket', 'item'])
+
+    def _costs_from_filled(self, filled):
+        """Multiplies filled prices by weights and sums per supermarket; incomplete baskets stay NaN."""
+        item_level = filled.columns.get_level_values('item')
+        weighted = filled * self.weights.reindex(item_level).to_numpy()
+        # A supermarket only has a basket cost once every item has a known price there
+        complete = weighted.notna().T.groupby(level='supermarket').sum().T == len(self.weights)
+        cost = weighted.T.groupby(level='supermarket').sum(min_count=1).T
+        return cost.where(complete)
+
+    def fit(self, df):
+        """Builds the materialized tables from the complete receipt history."""
+        with profiler.span("basket.fit", rows=len(df)):
+            self._observed = pd.DataFrame()
+            self._filled = pd.DataFrame()
+            self._cost = pd.DataFrame()
+            self._merge(self._daily_prices(df))
+        return self
+
+    def update(self, new_rows):
+        """Merges newly arrived receipts and recomputes only the affected tail of the history."""
+        with profiler.span("basket.update", rows=len(new_rows)):
+            self._merge(self._daily_prices(new_rows))
+        return self
+
+    def _merge(self, daily):
+        if daily.empty:
+            return
+        first_new_day = daily.index.min()
+
+        if self._observed.empty:
+            observed = daily
+        else:
+            columns = self._observed.columns.union(daily.columns)
+            observed = self._observed.reindex(columns=columns)
+            observed = observed.combine_first(daily)
+            # Newer receipts for the same day replace older values
+            observed.update(daily)
+        observed = observed.sort_index(axis=1)
+
+        # Extend to a continuous daily calendar so every day has a row
+        full_range = pd.date_range(observed.index.min(), observed.index.max(), freq='D')
+        observed = observed.reindex(full_range)
+        observed.index.name = 'day'
+        self._observed = observed
+
+        # Only days from the first new receipt (or the first day past the old history) on can change;
+        # earlier rows keep their filled values
+        if not self._filled.empty and first_new_day > self._filled.index.min():
+            start = min(first_new_day, self._filled.index.max() + pd.Timedelta(days=1))
+            previous = self._filled.reindex(columns=observed.columns).loc[:start - pd.Timedelta(days=1)]
+            tail = observed.loc[start:]
+            tail_filled = pd.concat([previous.iloc[[-1]], tail]).ffill().iloc[1:]
+            self._filled = pd.concat([previous, tail_filled])
+            tail_cost = self._costs_from_filled(tail_filled)
+            columns = self._cost.columns.union(tail_cost.columns)
+            self._cost = pd.concat([self._cost.reindex(columns=columns).loc[:start - pd.Timedelta(days=1)],
+                                    tail_cost.reindex(columns=columns)])
+        else:
+            self._filled = observed.ffill()
+            self._cost = self._costs_from_filled(self._filled)
+
+    def basket_cost(self, freq='D'):
+        """
+        Returns the basket cost per supermarket (columns) over time.
+        freq='D' gives daily costs; 'W' gives the cost at the end of each week.
+        """
+        if self._cost.empty:
+            return pd.DataFrame()
+        if freq == 'D':
+            return self._cost
+        return self._cost.resample(freq).last()
+
+    def index_series(self, supermarket=None, freq='D', base=100.0):
+        """
+        Returns the basket index as a Series rebased so the first complete basket equals `base`.
+        Without a supermarket the index follows the mean cost over all stores with a complete basket.
+        """
+        cost = self.basket_cost(freq)
+        if cost.empty:
+            return pd.Series(dtype=float)
+        if supermarket is not None:
+            series = cost[supermarket] if supermarket in cost.columns else pd.Series(dtype=float)
+        else:
+            series = cost.mean(axis=1, skipna=True)
+        series = series.dropna()
+        if series.empty:
+            return series
+        index = series / series.iloc[0] * base
+        index.name = f"Döner Index ({supermarket or 'All Stores'})"
+        return index
+
+    def index_by_supermarket(self, freq='D', base=100.0):
+        """
+        Returns one index column per supermarket, ready for PriceChart.plot_index(). All stores share one
+        base: the mean basket cost over the stores on the first day every store has a complete basket equals
+        `base`, so the columns show price-level differences between stores as well as changes over time.
+        """
+        cost = self.basket_cost(freq).dropna(axis=1, how='all')
+        if cost.empty:
+            return pd.DataFrame()
+        # Baskets stay complete once every item has a price (forward fill), so this row has no gaps
+        shared_day = max(cost[supermarket].first_valid_index() for supermarket in cost.columns)
+        index = cost / cost.loc[shared_day].mean() * base
+        index.columns.name = None
+        return index
+
+    @property
+    def last_day(self):
+        """Most recent day covered by the materialized tables (None before fit)."""
+        return None if self._observed.empty else self._observed.index.max()
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import cities
+
+# Precomputed calendar / holiday / promotion-week features, keyed by the int32 day number used in the
+# receipts frames (days since 1970-01-01, see receipts.py). The table is built once with numpy for a
+# span of years; feature lookups for any set of days are then a single fancy-indexing operation.
+# Holidays differ by region, so there is one table per holiday region (see cities.py).
+
+# Calendar Configuration - Table span and promotion windows
+CALENDAR_CONFIG = {
+    'first_year': 2000,
+    'last_year': 2040,            # Extended automatically when a lookup falls outside the span
+    'promo_lead_days': 7,         # Days before a holiday that supermarkets run holiday promotions
+    'month_start_days': 3,        # First days of the month (payday flyers)
+}
+
+# Public holidays per region (referenced by cities.CITY_CONFIG[...]['holiday_region'])
+HOLIDAY_REGIONS = {
+    'NW': {  # North Rhine-Westphalia
+        # Fixed-date public holidays as (month, day)
+        'fixed_holidays': [(1, 1), (5, 1), (10, 3), (11, 1), (12, 25), (12, 26)],
+        # Movable holidays as offsets from Easter Sunday: Good Friday, Easter Monday, Ascension, Whit Monday, Corpus Christi
+        'easter_offsets': [-2, 1, 39, 50, 60],
+    },
+    'BE': {  # Berlin
+        'fixed_holidays': [(1, 1), (3, 8), (5, 1), (10, 3), (12, 25), (12, 26)],
+        'easter_offsets': [-2, 1, 39, 50],
+    },
+}
+
+# Model inputs provided by the table, in column order
+SEASONAL_COLUMNS = ['dow_sin', 'dow_cos', 'doy_sin', 'doy_cos', 'doy_sin2', 'doy_cos2',
+                    'holiday', 'promo_week', 'month_start']
+
+_tables = {}  # holiday region -> feature table
+
+
+def easter_sundays(years):
+    """Gregorian Easter Sunday for each year (anonymous Gregorian algorithm), as datetime64[D]."""
+    y = np.asarray(years, dtype=np.int64)
+    a = y % 19
+    b, c = y // 100, y % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    first_of_month = (y - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1)
+    return first_of_month.astype('datetime64[D]') + (day - 1)
+
+
+def _region(region=None):
+    return region or cities.city_config()['holiday_region']
+
+
+def holiday_days(first_year, last_year, region=None):
+    """Sorted int day numbers of the public holidays of a region (default: current city) between first_year and last_year."""
+    holidays = HOLIDAY_REGIONS[_region(region)]
+    years = np.arange(first_year, last_year + 1)
+    year_starts = (years - 1970).astype('datetime64[Y]')
+    days = []
+    for month, day in holidays['fixed_holidays']:
+        days.append(year_starts.astype('datetime64[M]') + (month - 1))
+        days[-1] = days[-1].astype('datetime64[D]') + (day - 1)
+    easter = easter_sundays(years)
+    days.extend(easter + offset for offset in holidays['easter_offsets'])
+    return np.unique(np.concatenate(days).astype(np.int64))
+
+
+def _build(first_year, last_year, region):
+    """Builds the feature table of a holiday region for every day of the given years (one row per day number)."""
+    first_day = int(np.datetime64(f"{first_year}-01-01", 'D').astype(np.int64))
+    last_day = int(np.datetime64(f"{last_year}-12-31", 'D').astype(np.int64))
+    days = np.arange(first_day, last_day + 1)
+    dates = days.astype('datetime64[D]')
+
+    day_of_week = (days + 3) % 7  # 1970-01-01 was a Thursday; Monday = 0 as in pandas
+    day_of_year = (dates - dates.astype('datetime64[Y]')).astype(np.int64) + 1
+    month_index = dates.astype('datetime64[M]')
+    month = month_index.astype(np.int64) % 12 + 1
+    day_of_month = (dates - month_index).astype(np.int64) + 1
+
+    holidays = holiday_days(first_year, last_year, region)
+    holiday = np.isin(days, holidays)
+    # Promotion week: any of the next promo_lead_days days is a holiday
+    next_holiday = holidays[np.minimum(np.searchsorted(holidays, days + 1), len(holidays) - 1)]
+    days_ahead = next_holiday - days
+    promo_week = (days_ahead > 0) & (days_ahead <= CALENDAR_CONFIG['promo_lead_days'])
+
+    week_angle = 2 * np.pi * day_of_week / 7
+    year_angle = 2 * np.pi * (day_of_year - 1) / 365.25
+    table = pd.DataFrame({
+        'day_of_year': day_of_year,
+        'day_of_week': day_of_week,
+        'month': month,
+        'dow_sin': np.sin(week_angle),
+        'dow_cos': np.cos(week_angle),
+        'doy_sin': np.sin(year_angle),
+        'doy_cos': np.cos(year_angle),
+        'doy_sin2': np.sin(2 * year_angle),
+        'doy_cos2': np.cos(2 * year_angle),
+        'holiday': holiday.astype(np.float64),
+        'promo_week': promo_week.astype(np.float64),
+        'month_start': (day_of_month <= CALENDAR_CONFIG['month_start_days']).astype(np.float64),
+    }, index=pd.Index(days, name='day'))
+    return table
+
+
+def calendar_table(days=None, region=None):
+    """
+    Returns the precomputed calendar table of a holiday region (default: current city; index: day number).
+    The table is built on first use and rebuilt over a wider span of years if `days` contains day numbers outside it.
+    """
+    region = _region(region)
+    table = _tables.get(region)
+    if table is None:
+        table = _tables[region] = _build(CALENDAR_CONFIG['first_year'], CALENDAR_CONFIG['last_year'], region)
+    if days is not None and len(days):
+        low, high = int(np.min(days)), int(np.max(days))
+        if low < table.index[0] or high > table.index[-1]:
+            first_year = min(CALENDAR_CONFIG['first_year'], int(str(np.datetime64(low, 'D'))[:4]))
+            last_year = max(CALENDAR_CONFIG['last_year'], int(str(np.datetime64(high, 'D'))[:4]))
+            table = _tables[region] = _build(first_year, last_year, region)
+    return table
+
+
+def features_for_days(days, columns=None, region=None):
+    """Feature rows for an array of day numbers as a (len(days) x len(columns)) float array."""
+    days = np.asarray(days, dtype=np.int64)
+    table = calendar_table(days, region)
+    values = table[columns or SEASONAL_COLUMNS].to_numpy(dtype=np.float64)
+    return values[days - table.index[0]]
@@ -0,0 +1,165 @@
+import numpy as np
+import matplotlib.dates as mdates
+import matplotlib.ticker as mticker
+import receipts
+
+# Drawing code shared by the PriceChart widget and the headless report renderer.
+# Nothing in this module imports Qt, so it also works on the Agg backend in worker processes.
+
+# Chart Styling Configuration - Centralized styling (Vintage Newspaper Theme)
+CHART_STYLE = {
+    # Colors (matching vintage newspaper aesthetic from style.qss)
+    'background_color': '#fdfbf7',  # Paper color
+    'ink_color': '#1a1a1a',          # Ink color
+    'grey_color': '#666666',          # Muted grey for placeholders
+    
+    # Line and marker styling
+    'line_width': 2,
+    'line_color': '#1a1a1a',
+    'marker_style': 'o',
+    'marker_size': 4,
+    'marker_face_color': 'white',
+    'marker_edge_color': '#1a1a1a',
+    
+    # Grid styling
+    'grid_linestyle': '--',
+    'grid_alpha': 0.3,
+    'grid_color': '#1a1a1a',
+    
+    # Fonts
+    'font_family': 'Noto Serif',
+    'tick_font_size': 8,
+    'annotation_font_size': 8,
+    
+    # Axis styling
+    'y_tick_interval': 0.2,
+    
+    # Annotation styling
+    'annotation_box_style': 'round,pad=0.5',
+    'annotation_bg_color': 'white',
+    'annotation_edge_color': 'k',
+    'annotation_line_width': 1,
+    'annotation_alpha': 0.7,
+    'annotation_offset': 10,
+}
+
+def _prepare_axes(figure):
+    """Clears the figure and returns a fresh axes in the vintage newspaper style."""
+    figure.clear() # Clear the figure
+    ax = figure.add_subplot(111)
+    # Set facecolor again after clear
+    figure.set_facecolor(CHART_STYLE['background_color'])
+    ax.set_facecolor(CHART_STYLE['background_color'])
+    
+    # Remove top and right spines for a cleaner look
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_color(CHART_STYLE['ink_color'])
+    ax.spines['bottom'].set_color(CHART_STYLE['ink_color'])
+    return ax
+
+def _style_ticks_and_grid(ax):
+    # Set x-axis tick labels
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    ax.tick_params(axis='x', labelsize=CHART_STYLE['tick_font_size'], 
+                   colors=CHART_STYLE['ink_color'], 
+                   labelfontfamily=CHART_STYLE['font_family'])
+    ax.tick_params(axis='y', labelsize=CHART_STYLE['tick_font_size'], 
+                   colors=CHART_STYLE['ink_color'], 
+                   labelfontfamily=CHART_STYLE['font_family'])
+
+    # Add grid lines (horizontal only, dashed)
+    ax.yaxis.grid(True, linestyle=CHART_STYLE['grid_linestyle'], 
+                  alpha=CHART_STYLE['grid_alpha'], 
+                  color=CHART_STYLE['grid_color'])
+    ax.xaxis.grid(False)
+
+def draw_price_history(figure, df, forecast=None, promotions=None):
+    """
+    Draws the price history step chart (or the empty placeholder) onto figure, optionally followed by a
+    seasonal forecast. promotions is an optional Series of event kinds aligned with df (see promotions.py).
+    Returns (ax, sorted_df, line); line is None for an empty DataFrame.
+    """
+    ax = _prepare_axes(figure)
+    line = None
+
+    if not df.empty:
+        df = df.sort_values(by='day')
+        
+        # Use 'step' plot with 'post' (equivalent to stepAfter)
+        # Use ink-black for the line
+        # Day numbers count from 1970-01-01, Matplotlib's date epoch, so they plot as dates directly
+        line, = ax.step(df['day'].to_numpy(), df['price'].to_numpy(), where='post', 
+                        color=CHART_STYLE['line_color'], 
+                        linewidth=CHART_STYLE['line_width'], 
+                        marker=CHART_STYLE['marker_style'], 
+                        markersize=CHART_STYLE['marker_size'], 
+                        markerfacecolor=CHART_STYLE['marker_face_color'], 
+                        markeredgecolor=CHART_STYLE['marker_edge_color'])
+        if forecast is not None:
+            draw_forecast(ax, forecast)
+        if promotions is not None:
+            draw_promotions(ax, df, promotions.reindex(df.index))
+        
+        _style_ticks_and_grid(ax)
+        # Set y-axis interval
+        ax.yaxis.set_major_locator(mticker.MultipleLocator(CHART_STYLE['y_tick_interval']))
+
+        figure.tight_layout()
+
+    else:
+        ax.text(0.5, 0.5, "Awaiting data points...",
+                horizontalalignment='center',
+                verticalalignment='center',
+                transform=ax.transAxes,
+                fontfamily='serif',
+                fontstyle='italic',
+                color=CHART_STYLE['grey_color'])
+        
+        # Hide axes for empty state
+        ax.set_axis_off()
+
+    return ax, df, line
+
+def draw_forecast(ax, forecast):
+    """Draws a seasonal forecast (result of ml_model.get_seasonal_forecast) as a dashed continuation of the history."""
+    days = np.array([receipts.day_number(d) for d in forecast['dates']])
+    ax.plot(days, forecast['predictions'], linestyle='--',
+            color=CHART_STYLE['grey_color'],
+            linewidth=CHART_STYLE['line_width'] / 2)
+    best = forecast['best_day_index']
+    ax.plot(days[best], forecast['predictions'][best], marker=CHART_STYLE['marker_style'],
+            markersize=CHART_STYLE['marker_size'] * 1.5,
+            markerfacecolor=CHART_STYLE['ink_color'],
+            markeredgecolor=CHART_STYLE['ink_color'])
+
+def draw_promotions(ax, df, kinds):
+    """Marks detected drops / promotions with downward and price increases with upward triangles."""
+    for marker, flagged in (('v', kinds.isin(['promotion', 'price_drop'])), ('^', kinds == 'price_increase')):
+        if flagged.any():
+            ax.plot(df['day'].to_numpy()[flagged.to_numpy()], df['price'].to_numpy()[flagged.to_numpy()],
+                    linestyle='none', marker=marker,
+                    markersize=CHART_STYLE['marker_size'] * 2,
+                    markerfacecolor=CHART_STYLE['ink_color'],
+                    markeredgecolor=CHART_STYLE['background_color'])
+
+def draw_index(figure, index):
+    """Draws a basket index (DataFrame with one column per supermarket) as step lines. Returns the axes."""
+    ax = _prepare_axes(figure)
+
+    # Alternate line styles instead of colors to stay within the monochrome theme
+    line_styles = ['-', '--', ':', '-.']
+    for i, column in enumerate(index.columns):
+        series = index[column].dropna()
+        ax.step(series.index, series.to_numpy(), where='post',
+                color=CHART_STYLE['line_color'],
+                linewidth=CHART_STYLE['line_width'],
+                linestyle=line_styles[i % len(line_styles)],
+                label=str(column))
+
+    if len(index.columns) > 1:
+        ax.legend(frameon=False, prop={'family': CHART_STYLE['font_family'],
+                                       'size': CHART_STYLE['tick_font_size']})
+    _style_ticks_and_grid(ax)
+    figure.tight_layout()
+    return ax
@@ -0,0 +1,44 @@
+import os
+
+# City editions: everything that differs between cities (receipt partition, geocoding context, map center,
+# public holidays, masthead) is data in CITY_CONFIG. The code paths are identical for every city; each
+# query, cache and fitted model is keyed by the city it belongs to.
+
+# City Configuration - One entry per edition
+CITY_CONFIG = {
+    'muenster': {
+        'name': 'Münster',               # Appended to geocoding queries
+        'country': 'Germany',
+        'edition': 'Muenster Edition',   # Masthead label
+        'center': (51.9607, 7.6261),     # Map center and geocoding fallback
+        'receipts_table': 'receipts',    # Supabase table / Postgres partition holding this city's receipts
+        'holiday_region': 'NW',          # calendar_features.HOLIDAY_REGIONS key (North Rhine-Westphalia)
+    },
+    # A new city only needs an entry here and its own receipts partition, e.g.
+    # 'berlin': {'name': 'Berlin', 'country': 'Germany', 'edition': 'Berlin Edition',
+    #            'center': (52.5200, 13.4050), 'receipts_table': 'receipts_berlin', 'holiday_region': 'BE'},
+}
+
+# City used when none is given (DONERPRICER_CITY, or --city on the command line of main.py / report.py)
+DEFAULT_CITY = os.environ.get("DONERPRICER_CITY", "muenster")
+
+_current_city = DEFAULT_CITY
+
+
+def set_city(city):
+    """Selects the edition served by this process; queries and caches without an explicit city use it."""
+    global _current_city
+    city_config(city)
+    _current_city = city
+
+
+def current_city():
+    return _current_city
+
+
+def city_config(city=None):
+    """Configuration of `city` (default: the current city). Raises ValueError for unknown cities."""
+    city = city or _current_city
+    if city not in CITY_CONFIG:
+        raise ValueError(f"Unknown city '{city}'. Configured cities: {', '.join(sorted(CITY_CONFIG))}")
+    return CITY_CONFIG[city]
@@ -0,0 +1,131 @@
+from collections import defaultdict, OrderedDict
+import numpy as np
+from PySide6.QtWidgets import QCompleter
+from PySide6.QtCore import QStringListModel, Qt
+from product_index import normalize_name
+import profiler
+
+# Completion Configuration - Centralized settings for the type-ahead search
+COMPLETION_CONFIG = {
+    'max_suggestions': 15,   # Rows shown in the popup
+    'history_size': 32,      # Previous result sets kept for refinement / backspace
+}
+
+
+class CatalogSearch:
+    """
+    Substring and multi-word search over the item catalog, ranked by receipt count.
+
+    Item ids are assigned in descending receipt-count order, so any sorted id array is already ranked.
+    A query intersects precomputed 1/2/3-gram posting lists; a query that extends a recent one
+    (the usual case while typing) only filters that query's cached result set, so each keystroke
+    narrows the previous result without touching the posting lists.
+    """
+
+    def __init__(self, item_counts):
+        with profiler.span("completion.build", items=len(item_counts)):
+            ordered = sorted(item_counts.items(), key=lambda kv: (-kv[1], kv[0]))
+            self.names = [name for name, _count in ordered]
+            self.counts = np.array([count for _name, count in ordered], dtype=np.int32)
+            self.normalized = [normalize_name(name) for name in self.names]
+
+            postings = defaultdict(list)
+            for i, text in enumerate(self.normalized):
+                grams = set()
+                for n in (1, 2, 3):
+                    grams.update(text[j:j + n] for j in range(len(text) - n + 1))
+                for gram in grams:
+                    postings[gram].append(i)
+            # Appended in id order, so every posting list is sorted
+            self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+            self._all_ids = np.arange(len(self.names), dtype=np.int32)
+            self._history = OrderedDict()  # normalized query -> sorted ids
+
+    def _candidates(self, word):
+        """Sorted ids whose normalized name may contain `word` (exact for words up to 3 characters)."""
+        if len(word) <= 3:
+            return self._postings.get(word, self._all_ids[:0])
+        grams = [word[j:j + 3] for j in range(len(word) - 2)]
+        lists = sorted((self._postings.get(gram, self._all_ids[:0]) for gram in set(grams)), key=len)
+        ids = lists[0]
+        for other in lists[1:]:
+            if len(ids) == 0:
+                break
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return ids
+
+    def _filter(self, ids, words):
+        """Keeps the ids whose normalized name contains every query word."""
+        normalized = self.normalized
+        return np.array([i for i in ids if all(word in normalized[i] for word in words)], dtype=np.int32)
+
+    def _closest_previous(self, query):
+        """Longest remembered query that the new query extends (its results are a superset)."""
+        best = None
+        for previous in self._history:
+            if query.startswith(previous) and (best is None or len(previous) > len(best)):
+                best = previous
+        return best
+
+    def _remember(self, query, ids):
+        self._history[query] = ids
+        self._history.move_to_end(query)
+        while len(self._history) > COMPLETION_CONFIG['history_size']:
+            self._history.popitem(last=False)
+
+    def match_ids(self, text):
+        """Returns the ranked ids of all items matching every word of `text`."""
+        query = normalize_name(text)
+        if not query:
+            return self._all_ids
+        if query in self._history:
+            self._history.move_to_end(query)
+            return self._history[query]
+
+        words = query.split()
+        previous = self._closest_previous(query)
+        if previous is not None:
+            # Typing more characters can only narrow the result: refine the earlier set instead of rescanning
+            ids = self._filter(self._history[previous], words)
+        else:
+            longest = max(words, key=len)
+            ids = self._candidates(longest)
+            if len(words) > 1 or len(longest) > 3:
+                ids = self._filter(ids, words)
+        self._remember(query, ids)
+        return ids
+
+    def complete(self, text, limit=COMPLETION_CONFIG['max_suggestions']):
+        """Returns up to `limit` item names matching `text`, most frequently bought first."""
+        return [self.names[i] for i in self.match_ids(text)[:limit]]
+
+
+class CatalogCompleter(QCompleter):
+    """QCompleter whose popup is filled by CatalogSearch on every keystroke instead of Qt's prefix filter."""
+
+    def __init__(self, item_counts, parent=None):
+        super().__init__(parent)
+        self.search = CatalogSearch(item_counts)
+        self.suggestions = QStringListModel(self)
+        self.setModel(self.suggestions)
+        # The model already holds only matching rows, so Qt must not filter it again
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.setCaseSensitivity(Qt.CaseInsensitive)
+
+    def set_catalog(self, item_counts):
+        """Replaces the searched catalog, e.g. after the item list was refreshed from the database."""
+        self.search = CatalogSearch(item_counts)
+
+    def attach(self, combo_box):
+        """Installs the completer on an editable QComboBox and refreshes suggestions as the user types."""
+        combo_box.setCompleter(self)
+        combo_box.lineEdit().textEdited.connect(self.update_suggestions)
+        # QComboBox resolves an activated completion with findText(), which fails (index -1) for catalog
+        # items that are not in the dropdown; runs after that handler and sets the picked text explicitly
+        self.activated[str].connect(combo_box.setCurrentText)
+
+    def update_suggestions(self, text):
+        with profiler.span("completion.keystroke", length=len(text)):
+            self.suggestions.setStringList(self.search.complete(text))
+        if text:
+            self.complete()
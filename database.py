@@ -1,7 +1,16 @@
 import os
+import random
+import threading
+import time
+from collections import Counter
+import httpx
 import pandas as pd
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
+import cities
+import profiler
+import product_index
+import receipts
 
 # Initialize Supabase client
 load_dotenv()
@@ -12,49 +21,210 @@ key: str = os.environ.get("SUPABASE_KEY")
 if not url or not key:
     raise ValueError("Supabase URL and Key must be set in the .env file.")
 
-supabase: Client = create_client(url, key)
+# Data Access Configuration - Connection pool, timeouts and retry policy
+DB_CONFIG = {
+    'max_connections': 10,         # Upper bound of concurrent HTTP connections
+    'max_keepalive_connections': 5,
+    'keepalive_expiry': 30.0,      # Seconds an idle connection is kept open
+    'timeout': 10.0,               # Seconds per request
+    'retries': 3,                  # Extra attempts for timeouts / transport errors
+    'backoff': 0.5,                # First retry delay in seconds, doubled per attempt
+    'backoff_max': 4.0,
+}
+
+def _create_client():
+    """Creates the Supabase client on top of one pooled keep-alive httpx client shared by all queries."""
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=DB_CONFIG['max_connections'],
+                            max_keepalive_connections=DB_CONFIG['max_keepalive_connections'],
+                            keepalive_expiry=DB_CONFIG['keepalive_expiry']),
+        timeout=httpx.Timeout(DB_CONFIG['timeout']),
+    )
+    try:
+        options = ClientOptions(httpx_client=http_client, postgrest_client_timeout=DB_CONFIG['timeout'])
+    except TypeError:
+        # Older supabase-py releases cannot take a shared httpx client; keep at least the timeout
+        http_client.close()
+        options = ClientOptions(postgrest_client_timeout=DB_CONFIG['timeout'])
+    return create_client(url, key, options=options)
+
+supabase: Client = _create_client()
+
+# Query statistics - round-trips issued, callers served by a coalesced query, retries
+stats = Counter()
+
+
+class _SingleFlight:
+    """
+    Deduplicates identical in-flight requests: the first caller for a key runs the query,
+    concurrent callers with the same key wait for and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+        if not leader:
+            stats['coalesced'] += 1
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
+
+_single_flight = _SingleFlight()
+
+def _with_retry(fn, label):
+    """Runs fn, retrying timeouts and transport errors with exponential backoff and jitter."""
+    for attempt in range(DB_CONFIG['retries'] + 1):
+        try:
+            return fn()
+        except httpx.TransportError as e: # Includes connect/read timeouts
+            if attempt == DB_CONFIG['retries']:
+                raise
+            stats['retries'] += 1
+            delay = min(DB_CONFIG['backoff_max'], DB_CONFIG['backoff'] * 2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"Query {label} failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def _execute(key, build_query):
+    """
+    Executes the query returned by build_query() once per distinct key at a time and returns its rows.
+    The rows are shared between coalesced callers and must be treated as read-only.
+    """
+    def run():
+        stats['queries'] += 1
+        with profiler.span("db.query", key=key):
+            return _with_retry(lambda: build_query().execute().data or [], key)
+    return _single_flight.do(key, run)
+
+# Supabase returns at most 1000 rows per request, so bulk reads are paged
+PAGE_SIZE = 1000
+
+def _fetch_all_pages(key, build_query):
+    """Runs the query returned by build_query() page by page and concatenates the rows (coalesced per key)."""
+    def run():
+        rows = []
+        start = 0
+        while True:
+            page = _with_retry(lambda: build_query().range(start, start + PAGE_SIZE - 1).execute().data or [], key)
+            stats['queries'] += 1
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            start += PAGE_SIZE
+    return _single_flight.do(key, run)
+
+def _receipts_frame(rows):
+    """Builds the app-wide receipts DataFrame: schema renames, bulk-computed unit prices, compact dtypes."""
+    df = pd.DataFrame(rows)
+    # Rename columns to match the schema for compatibility with the rest of the app
+    df = df.rename(columns={"purchase_date": "date", "price_eur": "price"})
+    df = product_index.add_unit_prices(df)
+    # Converted once here; everything downstream reads the categorical / int32 / float32 columns directly
+    return receipts.compact(df)
+
+def _receipts(city):
+    """Query on the receipts partition of a city; every query touches only its own city's table."""
+    return supabase.table(cities.city_config(city)['receipts_table'])
+
+def _item_rows(item_name, supermarket=None, city=None):
+    """All receipt rows of one item (optionally one supermarket); shared by searches and dropdown updates."""
+    city = city or cities.current_city()
+    def build_query():
+        query = _receipts(city).select("*").eq("item_name_en", item_name)
+        if supermarket:
+            query = query.eq("supermarket", supermarket)
+        return query
+    return _execute(("item", city, item_name, supermarket or None), build_query)
 
 # Used in main.py search_item() - Fetches complete historical data for ML prediction, table, chart, and map
-def get_prices_by_item_and_supermarket(item_name, supermarket=None):
+def get_prices_by_item_and_supermarket(item_name, supermarket=None, city=None):
     """Retrieves all price records for a given item and optionally supermarket from Supabase as a Pandas DataFrame."""
-    query = supabase.table("receipts").select("*").eq("item_name_en", item_name)
-    if supermarket:
-        query = query.eq("supermarket", supermarket)
-    
-    response = query.execute()
-    
-    if response.data:
-        df = pd.DataFrame(response.data)
-        # Rename columns to match the schema for compatibility with the rest of the app
-        df = df.rename(columns={"purchase_date": "date", "price_eur": "price"})
-        return df
+    with profiler.span("db.fetch", item=item_name, supermarket=supermarket):
+        rows = _item_rows(item_name, supermarket, city)
+
+    if rows:
+        return _receipts_frame(rows)
     else:
-        print("Error fetching data:", response)
+        print(f"No data found for {item_name} ({supermarket or 'all supermarkets'})")
         return pd.DataFrame()
 
+# Used in main.py __init__() - Builds the product index over every distinct item name
+def get_item_counts(city=None):
+    """Retrieves the number of receipts per item name from the city's receipts table as a Counter."""
+    city = city or cities.current_city()
+    rows = _fetch_all_pages(("item_names", city), lambda: _receipts(city).select("item_name_en").order("id"))
+    if not rows:
+        print("Error fetching item names: no rows returned")
+        return Counter()
+    return Counter(row['item_name_en'] for row in rows if row['item_name_en'])
+
 # Used in main.py __init__() - Populates the product search dropdown on app startup
-def get_all_item_names():
-    """Retrieves all unique item names from the Supabase 'receipts' table."""
-    response = supabase.table("receipts").select("item_name_en").execute()
-    if response.data:
-        from collections import Counter
-        all_names = [row['item_name_en'] for row in response.data if row['item_name_en']]
-        counts = Counter(all_names)
-        # Filter for items with count >= 3
-        item_names = sorted([name for name, count in counts.items() if count >= 3])
-        return item_names
-    else:
-        print("Error fetching item names:", response)
-        return []
+def get_all_item_names(item_counts=None, city=None):
+    """Retrieves all unique item names bought at least 3 times, optionally from an already fetched Counter."""
+    counts = item_counts if item_counts is not None else get_item_counts(city)
+    # Filter for items with count >= 3
+    return sorted([name for name, count in counts.items() if count >= 3])
 
 # Used in main.py update_supermarket_input() - Dynamically fills supermarket dropdown when user selects a product
-def get_supermarkets_for_item(item_name):
-    """Retrieves all unique supermarket names for a specific item from the Supabase 'receipts' table."""
-    response = supabase.table("receipts").select("supermarket").eq("item_name_en", item_name).execute()
-    if response.data:
-        supermarkets = sorted(list(set([row['supermarket'] for row in response.data if row['supermarket']])))
+def get_supermarkets_for_item(item_name, city=None):
+    """Retrieves all unique supermarket names for a specific item from the city's receipts table."""
+    # Same query as an unfiltered search for the item, so a concurrent search shares the round-trip
+    rows = _item_rows(item_name, city=city)
+    if rows:
+        supermarkets = sorted(list(set([row['supermarket'] for row in rows if row['supermarket']])))
         return supermarkets
     else:
-        print("Error fetching supermarkets for item:", response)
+        print(f"No supermarkets found for item: {item_name}")
         return []
 
+# Used in basket.py - Fetches the full history of several items in one paged query
+def get_receipts_for_items(item_names, since=None, city=None):
+    """Retrieves all price records for the given items (optionally only rows on/after `since`) as a Pandas DataFrame."""
+    item_names = sorted(set(item_names))
+    city = city or cities.current_city()
+    def build_query():
+        query = _receipts(city).select("*").in_("item_name_en", item_names)
+        if since:
+            query = query.gte("purchase_date", since)
+        return query.order("id")
+
+    with profiler.span("db.fetch_items", items=len(item_names)):
+        rows = _fetch_all_pages(("items", city, tuple(item_names), since), build_query)
+    if not rows:
+        return pd.DataFrame()
+    return _receipts_frame(rows)
+
+# Used for whole-table analyses - Fetches every receipt row
+def get_all_receipts(since=None, city=None):
+    """Retrieves the city's complete receipts table (optionally only rows on/after `since`) as a Pandas DataFrame."""
+    city = city or cities.current_city()
+    def build_query():
+        query = _receipts(city).select("*")
+        if since:
+            query = query.gte("purchase_date", since)
+        return query.order("id")
+
+    with profiler.span("db.fetch_all"):
+        rows = _fetch_all_pages(("all", city, since), build_query)
+    if not rows:
+        return pd.DataFrame()
+    return _receipts_frame(rows)
@@ -0,0 +1,98 @@
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QPlainTextEdit,
+                             QFileDialog)
+from PySide6.QtGui import Qt
+import profiler
+
+
+class DiagnosticsPanel(QWidget):
+    """Hidden developer panel showing recorded timing spans and the last profile capture (toggle: Ctrl+Shift+D)."""
+
+    def __init__(self, parent=None, prefetch_metrics=None):
+        super().__init__(parent)
+        self.setObjectName("diagnostics-panel")
+        self.prefetch_metrics = prefetch_metrics # Callable returning prefetch.PrefetchLoader.metrics()
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+
+        title = QLabel("Diagnostics")
+        title.setProperty("class", "panel-title")
+        title.setAlignment(Qt.AlignCenter)
+        layout.addWidget(title)
+
+        self.status_label = QLabel("")
+        self.status_label.setProperty("class", "panel-subtitle")
+        self.status_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.status_label)
+
+        # Span summary table (one row per span name)
+        self.span_table = QTableWidget()
+        self.span_table.setColumnCount(5)
+        self.span_table.setHorizontalHeaderLabels(["SPAN", "COUNT", "LAST ms", "MEAN ms", "MAX ms"])
+        self.span_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.span_table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.span_table)
+
+        # Output of the last cProfile / tracemalloc capture
+        self.capture_output = QPlainTextEdit()
+        self.capture_output.setReadOnly(True)
+        self.capture_output.setPlaceholderText("No profile captured yet.")
+        layout.addWidget(self.capture_output)
+
+        button_row = QHBoxLayout()
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        clear_button = QPushButton("Clear")
+        clear_button.clicked.connect(self.clear_spans)
+        capture_button = QPushButton("Profile Next Search")
+        capture_button.clicked.connect(self.arm_capture)
+        export_button = QPushButton("Export Trace")
+        export_button.clicked.connect(self.export_trace)
+        for button in (refresh_button, clear_button, capture_button, export_button):
+            button_row.addWidget(button)
+        layout.addLayout(button_row)
+
+        self.setVisible(False)
+
+    def toggle(self):
+        self.setVisible(not self.isVisible())
+        if self.isVisible():
+            self.refresh()
+
+    def refresh(self):
+        rows = profiler.summary()
+        self.span_table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            self.span_table.setItem(i, 0, QTableWidgetItem(row["name"]))
+            self.span_table.setItem(i, 1, QTableWidgetItem(str(row["count"])))
+            self.span_table.setItem(i, 2, QTableWidgetItem(f"{row['last_ms']:.2f}"))
+            self.span_table.setItem(i, 3, QTableWidgetItem(f"{row['mean_ms']:.2f}"))
+            self.span_table.setItem(i, 4, QTableWidgetItem(f"{row['max_ms']:.2f}"))
+
+        capture = profiler.last_capture
+        if capture:
+            self.capture_output.setPlainText(
+                f"{capture['label']} @ {capture['time']}\n\n{capture['memory']}\n\n{capture['profile']}")
+
+        state = "on" if profiler.is_enabled() else "off"
+        status = f"Tracing {state} - {len(profiler.get_spans())} spans buffered"
+        if self.prefetch_metrics is not None:
+            metrics = self.prefetch_metrics()
+            status += (f" | Prefetch hit rate {100 * metrics['hit_rate']:.0f}% ({metrics['hits']}/{metrics['lookups']}), "
+                       f"{metrics['entries']} frames, {metrics['bytes'] / 1024 ** 2:.1f}/{metrics['max_bytes'] / 1024 ** 2:.0f} MB")
+        self.status_label.setText(status)
+
+    def clear_spans(self):
+        profiler.clear()
+        self.refresh()
+
+    def arm_capture(self):
+        profiler.arm_capture()
+        self.status_label.setText("Next search will be profiled (cProfile + tracemalloc)")
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Chrome Trace", "donerpricer_trace.json", "JSON (*.json)")
+        if path:
+            profiler.export_chrome_trace(path)
+            self.status_label.setText(f"Trace exported to {path}")
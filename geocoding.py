@@ -0,0 +1,92 @@
+import requests
+from time import sleep
+import cities
+
+# Geocoding shared by the VintageMap widget and the headless report renderer (no Qt imports here).
+
+# Cache for geocoded locations to avoid repeated API calls, keyed by (city, supermarket, location)
+_geocode_cache = {}
+
+def fallback_coords(city=None):
+    """City center, used when a location cannot be geocoded."""
+    return cities.city_config(city)['center']
+
+def _city_suffix(city):
+    config = cities.city_config(city)
+    return f"{config['name']}, {config['country']}"
+
+def _nominatim(query):
+    """Looks up a free-text query with the Nominatim API (OpenStreetMap). Returns (lat, lon) or None."""
+    try:
+        # Use Nominatim API (free, no API key required)
+        # User-Agent is required by Nominatim's usage policy
+        url = "https://nominatim.openstreetmap.org/search"
+        params = {
+            'q': query,
+            'format': 'json',
+            'limit': 1
+        }
+        headers = {
+            'User-Agent': 'Donerpricer/1.0 (Educational Project)'
+        }
+        
+        response = requests.get(url, params=params, headers=headers, timeout=5)
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data:
+                lat = float(data[0]['lat'])
+                lon = float(data[0]['lon'])
+                
+                # Be respectful to the API - wait 1 second between requests
+                sleep(1)
+                
+                return (lat, lon)
+    except Exception as e:
+        print(f"Geocoding error for {query}: {e}")
+    return None
+
+def geocode_location(supermarket, location, city=None):
+    """
+    Geocode a location using Nominatim API (OpenStreetMap) within a city (default: the current city).
+    Returns (latitude, longitude) tuple, the city center if geocoding fails.
+    Caches results to avoid repeated API calls.
+    """
+    city = city or cities.current_city()
+    # Check cache first
+    cache_key = (city, supermarket, location)
+    if cache_key in _geocode_cache:
+        return _geocode_cache[cache_key]
+    
+    # Construct search query: "Supermarket Location, Münster, Germany"
+    query = f"{supermarket} {location}, {_city_suffix(city)}"
+    result = _nominatim(query)
+    
+    # If geocoding fails, return the city center as fallback
+    if result is None:
+        result = fallback_coords(city)
+    
+    # Cache the result
+    _geocode_cache[cache_key] = result
+    return result
+
+def geocode_store(supermarket, location, city=None):
+    """Like geocode_location, but None instead of the city-center fallback (for distance queries)."""
+    coords = geocode_location(supermarket, location, city)
+    return None if coords == fallback_coords(city) else coords
+
+def geocode_address(address, city=None):
+    """Geocodes a user-entered address in a city (default: the current city). Returns (latitude, longitude) or None (cached)."""
+    city = city or cities.current_city()
+    cache_key = (city, None, address)
+    if cache_key not in _geocode_cache:
+        _geocode_cache[cache_key] = _nominatim(f"{address}, {_city_suffix(city)}")
+    return _geocode_cache[cache_key]
+
+def resolved_coords(city=None):
+    """Cache entries of a city that are real lookups: no failed addresses and no city-center fallbacks."""
+    city = city or cities.current_city()
+    fallback = fallback_coords(city)
+    # list(): background lookups may add entries meanwhile
+    return {key: coords for key, coords in list(_geocode_cache.items())
+            if key[0] == city and coords is not None and tuple(coords) != tuple(fallback)}
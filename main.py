@@ -1,21 +1,57 @@
+import argparse
+import functools
+import html
 import os
 import sys
+import threading
 from datetime import datetime
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QGridLayout, 
                              QLabel, QLineEdit, QPushButton, QTableWidget, 
                              QTableWidgetItem, QVBoxLayout, QHBoxLayout, 
-                             QComboBox, QCompleter, QHeaderView, QScrollArea, QFrame)
-from PySide6.QtGui import QFont, QFontDatabase, Qt
+                             QComboBox, QCompleter, QHeaderView, QScrollArea, QFrame,
+                             QCheckBox)
+from PySide6.QtGui import QFont, QFontDatabase, Qt, QKeySequence, QShortcut, QColor
+from PySide6.QtCore import QObject, Signal
 import database
 import ml_model
+import profiler
+import receipts
+from basket import BasketEngine
+from promotions import PromotionDetector, PROMOTION, PRICE_DROP, PRICE_INCREASE
+from store_compare import StoreComparison, COMPARE_CONFIG
+import geocoding
+import cities
+from session_cache import SessionCache, MODEL_TYPES, frame_fingerprint
+from prefetch import PrefetchLoader
+from product_index import ProductIndex, compare_variants
+from completion import CatalogCompleter
 from price_chart import PriceChart
 from map import VintageMap # Added this line
+from diagnostics_panel import DiagnosticsPanel
 import matplotlib.font_manager as fm
 # from vertical_double_line import VerticalDoubleLine # Removed import
 
+VARIANTS_LOADING = "Variants: loading..."
+
+class BackgroundTask(QObject):
+    """Runs a blocking call (database queries) on a daemon thread and delivers the result on the GUI thread."""
+    finished = Signal(str, object) # tag, result; queued to the receiver's (GUI) thread
+
+    def run(self, tag, fn):
+        def target():
+            try:
+                result = fn()
+            except Exception as e:
+                print(f"Background task '{tag}' failed: {e}")
+                return
+            self.finished.emit(tag, result)
+        threading.Thread(target=target, name=f"background-{tag}", daemon=True).start()
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, city=None):
         super().__init__()
+        self.city = city or cities.current_city()
+        city_config = cities.city_config(self.city)
 
         self.setWindowTitle("The Dönerpricer")
         self.setMinimumSize(800, 600) # Allow resizing, but maintain minimum
@@ -70,8 +106,8 @@ class MainWindow(QMainWindow):
         date_label = QLabel(datetime.now().strftime("%A, %B %d, %Y"))
         sub_layout.addWidget(date_label)
         sub_layout.addStretch()
-        berlin_label = QLabel("Muenster Edition")
-        sub_layout.addWidget(berlin_label)
+        edition_label = QLabel(city_config['edition'])
+        sub_layout.addWidget(edition_label)
         masthead_layout.addWidget(sub_header)
 
         main_layout.addWidget(masthead)
@@ -109,10 +145,20 @@ class MainWindow(QMainWindow):
         self.search_input.setEditable(True)
         self.search_input.setPlaceholderText("Product Name")
         self.search_input.setInsertPolicy(QComboBox.NoInsert)
-        self.search_input.completer().setCompletionMode(QCompleter.PopupCompletion)
         
-        item_names = database.get_all_item_names()
+        # The previous session's catalog is shown at once and refreshed in the background (see _revalidate)
+        self.session_cache = SessionCache(city=self.city).load()
+        item_counts = self.session_cache.item_counts or database.get_item_counts(city=self.city)
+        self.item_counts = item_counts
+        self.product_index = ProductIndex(item_counts) # Fuzzy lookup over every distinct item name
+        item_names = database.get_all_item_names(item_counts, city=self.city)
         self.search_input.addItems(item_names)
+        # Type-ahead covers the whole catalog (substring + multi-word), not only the dropdown's items
+        self.catalog_completer = CatalogCompleter(item_counts, self.search_input)
+        self.catalog_completer.attach(self.search_input)
+        # Connected first: the prefetch query is already in flight when the supermarket lookup below asks for the same rows
+        self.prefetch_loader = PrefetchLoader(self.city)
+        self.search_input.currentTextChanged.connect(self.prefetch_selection)
         self.search_input.currentTextChanged.connect(self.update_supermarket_input)
         
         search_inner_layout.addWidget(self.search_input, 0, Qt.AlignCenter)
@@ -126,10 +172,42 @@ class MainWindow(QMainWindow):
         
         search_inner_layout.addWidget(self.supermarket_input, 0, Qt.AlignCenter)
 
+        self.suggestion_label = QLabel("") # "Did you mean ..." for unknown item names (see search_item)
+        self.suggestion_label.setProperty("class", "panel-subtitle")
+        self.suggestion_label.setVisible(False)
+        self.suggestion_label.linkActivated.connect(self.accept_suggestion)
+        self.suggested_name = None
+        search_inner_layout.addWidget(self.suggestion_label, 0, Qt.AlignCenter)
+
         self.search_button = QPushButton("Search")
         self.search_button.setObjectName("search-button")
         self.search_button.clicked.connect(self.search_item)
         search_inner_layout.addWidget(self.search_button, 0, Qt.AlignCenter)
+
+        self.index_button = QPushButton("Döner Index")
+        self.index_button.setObjectName("search-button")
+        self.index_button.clicked.connect(self.show_doner_index)
+        search_inner_layout.addWidget(self.index_button, 0, Qt.AlignCenter)
+
+        # Cheapest store(s) near an address for a shopping list (store_compare.py)
+        self.list_input = QLineEdit()
+        self.list_input.setPlaceholderText("Shopping List (comma separated, default: product above)")
+        search_inner_layout.addWidget(self.list_input, 0, Qt.AlignCenter)
+
+        self.near_input = QLineEdit()
+        self.near_input.setPlaceholderText("Near Address (Optional, default: city center)")
+        search_inner_layout.addWidget(self.near_input, 0, Qt.AlignCenter)
+
+        self.radius_input = QComboBox()
+        for radius in COMPARE_CONFIG['radius_choices']:
+            self.radius_input.addItem(f"Within {radius:g} km", radius)
+        self.radius_input.setCurrentIndex(COMPARE_CONFIG['radius_choices'].index(COMPARE_CONFIG['radius_km']))
+        search_inner_layout.addWidget(self.radius_input, 0, Qt.AlignCenter)
+
+        self.nearby_button = QPushButton("Cheapest Nearby")
+        self.nearby_button.setObjectName("search-button")
+        self.nearby_button.clicked.connect(self.show_cheapest_nearby)
+        search_inner_layout.addWidget(self.nearby_button, 0, Qt.AlignCenter)
         
         search_panel_layout.addWidget(search_inner)
         main_layout.addWidget(search_panel, 0)
@@ -186,6 +264,19 @@ class MainWindow(QMainWindow):
         self.confidence_label.setAlignment(Qt.AlignRight)
         recommendation_inner_layout.addWidget(self.confidence_label)
 
+        # Forecast mode: bootstrap predictive intervals and P(cheapest day) instead of the volatility heuristic
+        forecast_options = QHBoxLayout()
+        forecast_options.addStretch()
+        self.forecast_checkbox = QCheckBox("Probabilistic Forecast")
+        forecast_options.addWidget(self.forecast_checkbox)
+        # Horizons beyond one week use the seasonal model (ml_model.get_seasonal_forecast)
+        self.horizon_input = QComboBox()
+        self.horizon_input.setObjectName("horizon-input")
+        for days in ml_model.SEASONAL_CONFIG['horizons']:
+            self.horizon_input.addItem(f"{days} Days", days)
+        forecast_options.addWidget(self.horizon_input)
+        recommendation_inner_layout.addLayout(forecast_options)
+
         recommendation_panel_layout.addWidget(recommendation_inner)
         main_layout.addWidget(recommendation_panel, 0)
 
@@ -216,6 +307,11 @@ class MainWindow(QMainWindow):
         self.history_table.horizontalHeader().setStretchLastSection(True)
         self.history_table.horizontalHeader().sectionClicked.connect(self.sort_table)
         table_inner_layout.addWidget(self.history_table)
+
+        self.variants_label = QLabel("")
+        self.variants_label.setProperty("class", "panel-subtitle")
+        self.variants_label.setWordWrap(True)
+        table_inner_layout.addWidget(self.variants_label)
         
         table_panel_layout.addWidget(table_inner)
         main_layout.addWidget(table_panel, 0) # Fit to content
@@ -272,76 +368,510 @@ class MainWindow(QMainWindow):
         map_subtitle.setAlignment(Qt.AlignCenter)
         map_inner_layout.addWidget(map_subtitle)
 
-        self.vintage_map = VintageMap()
+        self.vintage_map = VintageMap(city=self.city)
         map_inner_layout.addWidget(self.vintage_map)
         
         map_panel_layout.addWidget(map_inner)
         main_layout.addWidget(map_panel, 1)
 
+        # 6. Diagnostics (hidden developer panel, toggled with Ctrl+Shift+D)
+        self.diagnostics_panel = DiagnosticsPanel(prefetch_metrics=self.prefetch_loader.metrics)
+        main_layout.addWidget(self.diagnostics_panel, 0)
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, activated=self.diagnostics_panel.toggle)
+
         main_layout.addStretch()
 
         self.current_sort_column = -1
         self.sort_order = Qt.AscendingOrder
+        self.basket_engine = None # Built in the background on first "Döner Index" click, then updated incrementally
+        self.basket_loading = False # Döner Index receipts are being fetched
+        self.promotion_detector = None # Fitted on the whole history in the background on the first search, then updated with searched rows
+        self.promotions_loading = False # Background fit of the promotion detector in progress
+        self.store_comparison = None # Built in the background on first "Cheapest Nearby" click, then updated with searched rows
+        self.nearby_query = None # Latest (items, address, radius) asked for
+        self.nearby_loading = False # Address geocoding / store comparison fit in progress
+        self.current_search = None # (item, supermarket) currently shown
+        self.pending_search = None # (item, supermarket, forecast_mode, horizon) being fetched in the background
+
+        # Warm start: models, geocodes and the last search of the previous session, revalidated in the background
+        for name, model in self.session_cache.models.items():
+            setattr(self, name, model)
+        geocoding._geocode_cache.update(self.session_cache.geocodes)
+        self.restored_search = self.session_cache.last_search
+        self.prefetch_loader.remember(self.session_cache.searches)
+        if self.restored_search is not None:
+            self._restore_search(self.restored_search)
+        self.background = BackgroundTask(self)
+        self.background.finished.connect(self._on_background_result)
+        if self.session_cache.item_counts is not None:
+            self._revalidate()
 
     def search_item(self):
         item_name = self.search_input.currentText() # Get text from QComboBox
         supermarket_name = self.supermarket_input.currentText()
         print(f"Searching for: {item_name}, Supermarket: {supermarket_name}")
+        self.suggestion_label.setVisible(False)
+        # Free text like "eggs m/l" that normalizes to a known item name is the same item
+        resolved_name = self.product_index.exact_match(item_name) if item_name else None
+        if resolved_name and resolved_name != item_name:
+            print(f"Resolved '{item_name}' to '{resolved_name}'")
+            item_name = resolved_name
+            self.search_input.blockSignals(True) # Same item: no new supermarket lookup or prefetch
+            self.search_input.setCurrentText(item_name)
+            self.search_input.blockSignals(False)
+        elif item_name and resolved_name is None:
+            # A fuzzy match is only offered, never searched in place of the typed text
+            suggestion = self.product_index.best_match(item_name)
+            if suggestion is not None:
+                self.suggested_name = suggestion
+                self.suggestion_label.setText(f'Did you mean <a href="#">{html.escape(suggestion)}</a>?')
+                self.suggestion_label.setVisible(True)
+                return
         if item_name:
-            df = database.get_prices_by_item_and_supermarket(item_name, supermarket_name if supermarket_name and self.supermarket_input.isVisible() else None)
-            print(f"Found {len(df)} records")
-            self.current_df = df # Store DataFrame for sorting
-            self.populate_table(df)
-            ml_result = ml_model.get_recommendation(df) # Get dict result
-            
-            # Update Recommendation Panel
-            # Parse the recommendation string from ml_model.py
-            lines = ml_result["recommendation"].split("\n")
-            if len(lines) >= 3 and ": " in lines[0]:
-                best_day = lines[0].split(": ")[1]
-                best_price = lines[1].split(": ")[1]
-                confidence = float(lines[2].split(": ")[1].replace('%', ''))
-            else:
-                best_day = "-"
-                best_price = "- (Not enough data)"
-                confidence = 0.0
-            
-            # Only "BUY IT NOW!" if the best day is today
-            today_name = datetime.now().strftime("%A")
-            
-            if confidence < 70.0:
+            # profile_capture is a no-op unless a capture was armed from the diagnostics panel
+            with profiler.profile_capture(f"search: {item_name}"), profiler.span("search_item", item=item_name):
+                self._run_search(item_name, supermarket_name)
+            if self.diagnostics_panel.isVisible():
+                self.diagnostics_panel.refresh()
+
+    def accept_suggestion(self, _link):
+        """Searches the suggested item name after the user clicked it."""
+        self.search_input.setCurrentText(self.suggested_name) # Picked by the user: refresh supermarkets as usual
+        self.search_item()
+
+    def _run_search(self, item_name, supermarket_name):
+        supermarket = supermarket_name if supermarket_name and self.supermarket_input.isVisible() else None
+        forecast_mode, horizon = self.forecast_checkbox.isChecked(), self.horizon_input.currentData()
+        prefetched = self.prefetch_loader.take(item_name, supermarket, forecast_mode, horizon)
+        if prefetched is not None:
+            self.pending_search = None # A slower earlier search must not replace this one
+            df, ml_result = prefetched
+            print(f"Found {len(df)} prefetched records")
+            self._show_results(item_name, supermarket, df, ml_result=ml_result)
+            return
+
+        # Misses are queried and modeled off the GUI thread, like the prefetches themselves
+        query = (item_name, supermarket, forecast_mode, horizon)
+        self.pending_search = query
+        self.recommendation_header.setText("Searching...")
+        city = self.city
+
+        def fetch():
+            try:
+                df = database.get_prices_by_item_and_supermarket(item_name, supermarket, city=city)
+                return query, df, ml_model.get_prediction(df, forecast_mode, horizon, city=city)
+            except Exception as e:
+                print(f"Search for {item_name} failed: {e}")
+                return query, None, None
+        self.background.run("search", fetch)
+
+    def _apply_search(self, loaded):
+        query, df, ml_result = loaded
+        if query is not self.pending_search:
+            return # Superseded by a newer search
+        self.pending_search = None
+        if df is None:
+            self.recommendation_header.setText("Search failed, please try again.")
+            return
+        print(f"Found {len(df)} records")
+        item_name, supermarket, forecast_mode, horizon = query
+        if (forecast_mode, horizon) != (self.forecast_checkbox.isChecked(), self.horizon_input.currentData()):
+            ml_result = None # The mode was changed meanwhile; recomputed for the current one
+        with profiler.span("search.show", item=item_name):
+            self._show_results(item_name, supermarket, df, ml_result=ml_result)
+        if self.diagnostics_panel.isVisible():
+            self.diagnostics_panel.refresh()
+
+    def _show_results(self, item_name, supermarket, df, cached=None, ml_result=None):
+        """
+        Renders a search; `cached` is a session cache entry whose results are shown without recomputing them,
+        `ml_result` a model result that was already computed for df (prefetch).
+        """
+        self.current_df = df # Store DataFrame for sorting
+        self.current_search = (item_name, supermarket)
+        forecast_mode = self.forecast_checkbox.isChecked()
+        horizon = self.horizon_input.currentData()
+        if cached is not None:
+            promotion_kinds, ml_result = cached['promotions'], cached['result']
+        else:
+            promotion_kinds = self.update_promotions(df)
+            if self.store_comparison is not None:
+                self.store_comparison.update(df)
+            if ml_result is None:
+                ml_result = ml_model.get_prediction(df, forecast_mode, horizon, city=self.city) # Get dict result
+            self.prefetch_loader.searched(item_name, supermarket, df, forecast_mode, horizon, ml_result)
+        self.current_result = ml_result # Redrawn with flags once a background promotion fit completes
+        self.populate_table(df, promotion_kinds)
+
+        # Update Recommendation Panel
+        # Parse the recommendation string from ml_model.py
+        lines = ml_result["recommendation"].split("\n")
+        if len(lines) >= 3 and ": " in lines[0]:
+            best_day = lines[0].split(": ")[1]
+            best_price = lines[1].split(": ")[1]
+            confidence = float(lines[2].split(": ")[1].replace('%', ''))
+        else:
+            best_day = "-"
+            best_price = "- (Not enough data)"
+            confidence = 0.0
+
+        # Only "BUY IT NOW!" if the best day is today
+        today_name = datetime.now().strftime("%A")
+
+        if "predictions" in ml_result:
+            # Seasonal forecast: the best day may be weeks ahead, so show its date and the horizon
+            confidence = ml_result.get("confidence", confidence)
+            if not ml_result.get("seasonal_signal", True):
+                self.recommendation_header.setText("No seasonal price movement expected.")
+                self.day_value.setText("-")
+                self.price_value.setText(f"{ml_result['predictions'].mean():.2f} €")
+            elif confidence < 70.0:
                 self.recommendation_header.setText("Confidence too low for a reliable recommendation.")
                 self.day_value.setText("-")
                 self.price_value.setText("€ -")
-                self.confidence_label.setText(f"Confidence Index: {confidence:.2f}%")
             else:
-                if best_day == today_name:
-                    self.recommendation_header.setText("BUY IT NOW!")
-                else:
-                    self.recommendation_header.setText("HOLD YOUR WALLET!")
-                    
+                self.recommendation_header.setText("BUY IT NOW!" if ml_result["best_day_index"] == 0 else "HOLD YOUR WALLET!")
                 self.day_value.setText(best_day)
                 self.price_value.setText(best_price)
-                self.confidence_label.setText(f"Confidence Index: {confidence:.2f}%")
-            
-            self.price_chart.plot(df)
-            self.vintage_map.update_map(df)
-            self.record_count_label.setText(f"REC: {len(df)}")
-
-    def populate_table(self, df):
+            self.confidence_label.setText(f"Confidence Index ({horizon} Days): {confidence:.2f}%")
+        elif forecast_mode and "p_cheapest" in ml_result:
+            # Confidence is the bootstrap probability that the target day is the cheapest of the week
+            i = ml_result["best_day_index"]
+            if ml_result["p_cheapest"][i] <= 1.0 / len(ml_result["p_cheapest"]) + 1e-9:
+                # Every day is equally likely to be the cheapest (e.g. a constant price)
+                self.recommendation_header.setText("No day is expected to be cheaper.")
+            else:
+                self.recommendation_header.setText("BUY IT NOW!" if best_day == today_name else "HOLD YOUR WALLET!")
+            self.day_value.setText(best_day)
+            self.price_value.setText(f"{best_price} ({ml_result['lower'][i]:.2f}-{ml_result['upper'][i]:.2f})")
+            self.confidence_label.setText(f"P(Cheapest Day): {confidence:.2f}%")
+        elif confidence < 70.0:
+            self.recommendation_header.setText("Confidence too low for a reliable recommendation.")
+            self.day_value.setText("-")
+            self.price_value.setText("€ -")
+            self.confidence_label.setText(f"Confidence Index: {confidence:.2f}%")
+        else:
+            if best_day == today_name:
+                self.recommendation_header.setText("BUY IT NOW!")
+            else:
+                self.recommendation_header.setText("HOLD YOUR WALLET!")
+
+            self.day_value.setText(best_day)
+            self.price_value.setText(best_price)
+            self.confidence_label.setText(f"Confidence Index: {confidence:.2f}%")
+
+        self.price_chart.plot(df, forecast=ml_result if "predictions" in ml_result else None, promotions=promotion_kinds)
+        if cached is not None:
+            # Markers were geocoded in the previous session
+            self.vintage_map.show_markers(cached['map_payload'])
+            self.record_count_label.setText(f"REC: {len(df)} (cached)")
+            self.variants_label.setText(cached['variants'])
+            return
+        self.vintage_map.update_map(df)
+        self.record_count_label.setText(f"REC: {len(df)}")
+        self.update_variant_comparison(item_name)
+        variants_pending = self.variants_label.text() == VARIANTS_LOADING # Filled in by _apply_variants
+        self.session_cache.remember_search(
+            item_name, supermarket, forecast_mode, horizon, df=df, result=ml_result, promotions=promotion_kinds,
+            map_payload=self.vintage_map.last_payload, variants="" if variants_pending else self.variants_label.text(),
+            supermarkets=[self.supermarket_input.itemText(i) for i in range(self.supermarket_input.count())])
+
+    def _restore_search(self, entry):
+        """Shows a cached search of the previous session immediately, without any query."""
+        self.search_input.blockSignals(True) # No supermarket lookup for the restored item
+        self.search_input.setCurrentText(entry['item_name'])
+        self.search_input.blockSignals(False)
+        self.supermarket_input.clear()
+        self.supermarket_input.addItems(entry['supermarkets'])
+        self.supermarket_input.setCurrentText(entry['supermarket'] or "")
+        self.forecast_checkbox.setChecked(entry['forecast_mode'])
+        self.horizon_input.setCurrentIndex(max(self.horizon_input.findData(entry['horizon']), 0))
+        with profiler.span("session.restore", item=entry['item_name']):
+            self._show_results(entry['item_name'], entry['supermarket'], entry['df'], cached=entry)
+
+    def _revalidate(self):
+        """Refetches the catalog, the restored search and receipts newer than the restored models on a background thread."""
+        entry = self.restored_search
+        days = [model.last_day for model in (self.promotion_detector, self.store_comparison)
+                if model is not None and model.last_day is not None]
+        since = receipts.day_to_date(min(days)).strftime("%Y-%m-%d") if days else None
+
+        city = self.city
+
+        def fetch():
+            fresh = {'item_counts': database.get_item_counts(city=city)}
+            if entry is not None:
+                fresh['search'] = database.get_prices_by_item_and_supermarket(entry['item_name'], entry['supermarket'], city=city)
+            if since is not None:
+                fresh['new_receipts'] = database.get_all_receipts(since=since, city=city)
+            return fresh
+        self.background.run("revalidate", fetch)
+
+    def _on_background_result(self, tag, result):
+        if tag == "revalidate":
+            with profiler.span("session.revalidate"):
+                self._apply_revalidation(result)
+        elif tag == "promotions":
+            self._apply_promotions(result)
+        elif tag == "nearby":
+            self._apply_nearby(result)
+        elif tag == "variants":
+            self._apply_variants(result)
+        elif tag == "basket":
+            self._apply_basket(result)
+        elif tag == "search":
+            self._apply_search(result)
+
+    def _apply_revalidation(self, fresh):
+        if fresh['item_counts'] and fresh['item_counts'] != self.item_counts:
+            print(f"Catalog changed: {len(fresh['item_counts'])} items")
+            self._set_catalog(fresh['item_counts'])
+        new_receipts = fresh.get('new_receipts')
+        if new_receipts is not None and not new_receipts.empty:
+            # Already known receipts are skipped by both models
+            for model in (self.promotion_detector, self.store_comparison):
+                if model is not None:
+                    model.update(new_receipts)
+        entry = self.restored_search
+        if 'search' in fresh and self.current_search == (entry['item_name'], entry['supermarket']):
+            df = fresh['search']
+            if frame_fingerprint(df) != frame_fingerprint(entry['df']):
+                print("Restored search is outdated, refreshing")
+                self._show_results(entry['item_name'], entry['supermarket'], df)
+            else:
+                self.record_count_label.setText(f"REC: {len(df)}")
+
+    def _set_catalog(self, item_counts):
+        """Rebuilds the product index, dropdown and type-ahead from fresh item counts, keeping the typed text."""
+        self.item_counts = item_counts
+        self.product_index = ProductIndex(item_counts)
+        text = self.search_input.currentText()
+        self.search_input.blockSignals(True)
+        self.search_input.clear()
+        self.search_input.addItems(database.get_all_item_names(item_counts, city=self.city))
+        self.search_input.setCurrentText(text)
+        self.search_input.blockSignals(False)
+        self.catalog_completer.set_catalog(item_counts)
+
+    def closeEvent(self, event):
+        """Saves the session (catalog, recent searches, fitted models, geocodes) for a warm start next time."""
+        self.session_cache.item_counts = self.item_counts
+        self.session_cache.models = {name: getattr(self, name) for name in MODEL_TYPES}
+        # Failed lookups are retried next session instead of being restored
+        self.session_cache.geocodes = geocoding.resolved_coords(self.city)
+        self.session_cache.save()
+        self.prefetch_loader.close()
+        super().closeEvent(event)
+
+    def update_variant_comparison(self, item_name):
+        """Lists other spellings/pack sizes of the searched product with their median (unit) prices, queried in the background."""
+        variants = self.product_index.variants(item_name)
+        if len(variants) < 2:
+            self.variants_label.setText("")
+            return
+        self.variants_label.setText(VARIANTS_LOADING)
+        search, city = self.current_search, self.city
+
+        def compare():
+            try:
+                with profiler.span("variants.compare", variants=len(variants)):
+                    return search, compare_variants(database.get_receipts_for_items(variants, city=city))
+            except Exception as e:
+                print(f"Variant comparison failed: {e}")
+                return search, None
+        self.background.run("variants", compare)
+
+    def _apply_variants(self, compared):
+        search, summary = compared
+        parts = []
+        for name, row in (summary.iterrows() if summary is not None else []):
+            unit = f", {row['median_unit_price']:.4f} €/g" if row['median_unit_price'] == row['median_unit_price'] else ""
+            parts.append(f"{name}: {row['median_price']:.2f} €{unit} ({row['receipts']} rec.)")
+        text = "Variants: " + " | ".join(parts) if parts else ""
+        # Only if the search is still shown and the label was not reused meanwhile (Cheapest Nearby)
+        if search == self.current_search and self.variants_label.text() == VARIANTS_LOADING:
+            self.variants_label.setText(text)
+        entry = self.session_cache.last_search
+        if entry is not None and (entry['item_name'], entry['supermarket']) == search:
+            entry['variants'] = text
+
+    def show_doner_index(self):
+        """Plots the basket index per supermarket; receipts newer than the last computation are fetched in the background."""
+        if self.basket_loading:
+            return
+        self.basket_loading = True
+        engine, city = self.basket_engine, self.city
+        since = engine.last_day.strftime("%Y-%m-%d") if engine is not None and engine.last_day is not None else None
+        if engine is None:
+            self.recommendation_header.setText("Computing the Döner Index...")
+
+        def load():
+            try:
+                if engine is None:
+                    fresh = BasketEngine()
+                    return fresh.fit(database.get_receipts_for_items(fresh.items, city=city)), None
+                return engine, database.get_receipts_for_items(engine.items, since=since, city=city)
+            except Exception as e:
+                print(f"Döner Index failed: {e}")
+                return None, None
+        self.background.run("basket", load)
+
+    def _apply_basket(self, loaded):
+        engine, new_rows = loaded
+        self.basket_loading = False
+        if engine is None:
+            self.recommendation_header.setText("Could not load the Döner Index, please try again.")
+            return
+        with profiler.span("basket.show"):
+            if new_rows is not None:
+                engine.update(new_rows)
+            self.basket_engine = engine
+            index = engine.index_by_supermarket()
+        if index.empty:
+            self.recommendation_header.setText("Not enough data for the Döner Index.")
+            return
+        self.price_chart.plot_index(index)
+
+    def update_promotions(self, df):
+        """Returns the promotion / price change flag per row of df (see promotions.py)."""
+        if df.empty:
+            return None
+        if self.promotion_detector is None:
+            # Searches are shown without flags until the fit completes (see _apply_promotions)
+            self._fit_promotions()
+            return None
+        with profiler.span("promotions.search"):
+            # Receipts the detector already knows are skipped, so this only rescores new rows
+            self.promotion_detector.update(df)
+            return self.promotion_detector.kinds_for(df)
+
+    def _fit_promotions(self):
+        """Fits the promotion detector on the whole history on a background thread (once at a time)."""
+        if self.promotions_loading:
+            return
+        self.promotions_loading = True
+        city = self.city
+
+        def fit():
+            try:
+                return PromotionDetector().fit(database.get_all_receipts(city=city))
+            except Exception as e:
+                print(f"Promotion detector fit failed: {e}")
+                return None # Retried on the next search
+        self.background.run("promotions", fit)
+
+    def _apply_promotions(self, detector):
+        """Installs the detector fitted in the background and adds the flags to the search on screen."""
+        self.promotions_loading = False
+        if detector is None:
+            return
+        self.promotion_detector = detector
+        if self.current_search is None or self.current_df.empty:
+            return
+        df = self.current_df
+        with profiler.span("promotions.search"):
+            detector.update(df)
+            promotion_kinds = detector.kinds_for(df)
+        self.populate_table(df, promotion_kinds)
+        if not self.price_chart.df.empty: # Still showing the search, not the Döner Index
+            result = self.current_result
+            self.price_chart.plot(df, forecast=result if "predictions" in result else None, promotions=promotion_kinds)
+        entry = self.session_cache.last_search
+        if entry is not None and entry['df'] is df:
+            entry['promotions'] = promotion_kinds
+
+    def show_cheapest_nearby(self):
+        """Ranks the stores within the selected radius by the cost of the shopping list and shows them on the map."""
+        names = [name.strip() for name in self.list_input.text().split(",") if name.strip()]
+        names = names or [self.search_input.currentText()]
+        items = [self.product_index.best_match(name) or name for name in names if name]
+        if not items:
+            return
+        self.nearby_query = (items, self.near_input.text().strip(), self.radius_input.currentData())
+        if not self.nearby_loading: # Otherwise the latest query is picked up when the running task completes
+            self._load_nearby(self.nearby_query)
+
+    def _load_nearby(self, query):
+        """Geocodes the address and, on first use, fits the store comparison on a background thread."""
+        self.nearby_loading = True
+        _items, address, _radius = query
+        city = self.city
+        fit = self.store_comparison is None
+        if fit:
+            self.recommendation_header.setText("Locating stores...")
+
+        def load():
+            try:
+                center = (geocoding.geocode_address(address, city) if address else None) or geocoding.fallback_coords(city)
+                comparison = None
+                if fit:
+                    # Stores without stored coordinates are geocoded once (no city-center fallback, one lookup per second)
+                    locate = functools.partial(geocoding.geocode_store, city=city) # Picklable for the session cache
+                    comparison = StoreComparison(locate=locate).fit(database.get_all_receipts(city=city))
+                return query, center, comparison
+            except Exception as e:
+                print(f"Cheapest nearby failed: {e}")
+                return query, None, None
+        self.background.run("nearby", load)
+
+    def _apply_nearby(self, loaded):
+        query, center, comparison = loaded
+        self.nearby_loading = False
+        if comparison is not None:
+            self.store_comparison = comparison
+        if query is not self.nearby_query:
+            # Clicked again while loading: answer the latest query instead
+            self._load_nearby(self.nearby_query)
+            return
+        if center is None or self.store_comparison is None:
+            self.recommendation_header.setText("Could not load the stores, please try again.")
+            return
+        items, _address, radius_km = query
+        with profiler.span("compare.show", items=len(items)):
+            result = self.store_comparison.cheapest(items, *center, radius_km=radius_km)
+
+        if result['stores'].empty:
+            self.recommendation_header.setText(f"No store within {result['radius_km']:g} km sells these items.")
+            return
+        best = result['stores'].iloc[0]
+        self.recommendation_header.setText(
+            f"Cheapest: {best['supermarket']}, {best['location']} - {best['basket_cost']:.2f} € "
+            f"({best['items_available']}/{len(items)} items, {best['distance_km']:.1f} km)")
+        missing = f" | Not found: {', '.join(result['missing'])}" if result['missing'] else ""
+        self.variants_label.setText(f"Split across stores: {result['split_cost']:.2f} €{missing}")
+        self.vintage_map.show_store_ranking(result, len(items))
+
+    def populate_table(self, df, promotion_kinds=None):
+        with profiler.span("table.fill", rows=len(df)):
+            self._fill_table(df, promotion_kinds)
+
+    def _fill_table(self, df, promotion_kinds=None):
         self.history_table.setRowCount(len(df))
-        for i, row in df.iterrows():
-            self.history_table.setItem(i, 0, QTableWidgetItem(row["date"]))
-            self.history_table.setItem(i, 1, QTableWidgetItem(str(row["price"])))
+        if df.empty:
+            return
+        day_labels = receipts.day_strings(df) # Formatted in one vectorized call
+        kinds = promotion_kinds.to_numpy() if promotion_kinds is not None else [None] * len(df)
+        kinds = [kind if isinstance(kind, str) else None for kind in kinds] # Missing kinds may be NaN in older caches
+        badges = {PROMOTION: "SALE", PRICE_DROP: "▼", PRICE_INCREASE: "▲"}
+        for i, receipt in enumerate(receipts.records(df)):
+            self.history_table.setItem(i, 0, QTableWidgetItem(day_labels[i]))
+            # Prices are stored as float32, so format instead of str() to avoid float noise
+            price_item = QTableWidgetItem(f"{receipt.price:.2f}")
+            if kinds[i] is not None:
+                # Highlight detected promotions and lasting price changes
+                price_item.setText(f"{receipt.price:.2f} {badges[kinds[i]]}")
+                price_item.setToolTip(kinds[i].replace("_", " ").title())
+                price_item.setBackground(QColor("#e8e4da"))
+            self.history_table.setItem(i, 1, price_item)
             
-            # Calculate avgPrice/g or /ml
+            # avgPrice/g or /ml is precomputed in bulk at load time (NaN when the weight is unknown)
             avg_price = ""
-            if row["weight_grams"] and row["weight_grams"] > 0:
-                avg_price = f"{row['price'] / row['weight_grams']:.4f} €/g"
+            if receipt.unit_price == receipt.unit_price:
+                avg_price = f"{receipt.unit_price:.4f} €/g"
             
             self.history_table.setItem(i, 2, QTableWidgetItem(avg_price))
-            self.history_table.setItem(i, 3, QTableWidgetItem(row["supermarket"]))
-            self.history_table.setItem(i, 4, QTableWidgetItem(row["location"]))
+            self.history_table.setItem(i, 3, QTableWidgetItem(receipt.supermarket))
+            self.history_table.setItem(i, 4, QTableWidgetItem(receipt.location))
         # self.history_table.resizeColumnsToContents() # No longer needed
 
     def sort_table(self, column_index):
@@ -352,8 +882,14 @@ class MainWindow(QMainWindow):
         self.current_sort_column = column_index
         self.history_table.sortItems(column_index, self.sort_order)
 
+    def prefetch_selection(self, text):
+        """Starts loading the item picked in the dropdown (all supermarkets) before Search is clicked."""
+        if text in self.product_index:
+            self.prefetch_loader.request([(text, None)], self.forecast_checkbox.isChecked(),
+                                         self.horizon_input.currentData())
+
     def update_supermarket_input(self, text):
-        supermarkets = database.get_supermarkets_for_item(text)
+        supermarkets = database.get_supermarkets_for_item(text, city=self.city)
         if supermarkets:
             self.supermarket_input.clear()
             self.supermarket_input.addItems(supermarkets)
@@ -365,7 +901,12 @@ class MainWindow(QMainWindow):
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    # --city selects the edition (default: DONERPRICER_CITY, see cities.py); other arguments go to Qt
+    city_parser = argparse.ArgumentParser(add_help=False)
+    city_parser.add_argument("--city", default=cities.DEFAULT_CITY, choices=sorted(cities.CITY_CONFIG))
+    city_args, qt_args = city_parser.parse_known_args()
+    cities.set_city(city_args.city)
+    app = QApplication([sys.argv[0]] + qt_args)
 
     # Load custom fonts
     font_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "fonts"))
@@ -3,73 +3,34 @@ from PySide6.QtWebEngineWidgets import QWebEngineView
 from PySide6.QtGui import Qt # Import Qt for alignment
 import json
 import pandas as pd # Import pandas for DataFrame type hinting
-import requests
-from time import sleep
+import profiler
+import geocoding
+import receipts
+import cities
 
 class VintageMap(QWidget):
-    # Cache for geocoded locations to avoid repeated API calls
-    _geocode_cache = {}
+    # Cache for geocoded locations to avoid repeated API calls (shared with geocoding.py)
+    _geocode_cache = geocoding._geocode_cache
     
     @staticmethod
-    def geocode_location(supermarket, location):
-        """
-        Geocode a location using Nominatim API (OpenStreetMap).
-        Returns (latitude, longitude) tuple or None if geocoding fails.
-        Caches results to avoid repeated API calls.
-        """
-        # Check cache first
-        cache_key = (supermarket, location)
-        if cache_key in VintageMap._geocode_cache:
-            return VintageMap._geocode_cache[cache_key]
-        
-        # Construct search query: "Supermarket Location, Münster, Germany"
-        query = f"{supermarket} {location}, Münster, Germany"
-        
-        try:
-            # Use Nominatim API (free, no API key required)
-            # User-Agent is required by Nominatim's usage policy
-            url = "https://nominatim.openstreetmap.org/search"
-            params = {
-                'q': query,
-                'format': 'json',
-                'limit': 1
-            }
-            headers = {
-                'User-Agent': 'Donerpricer/1.0 (Educational Project)'
-            }
-            
-            response = requests.get(url, params=params, headers=headers, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data:
-                    lat = float(data[0]['lat'])
-                    lon = float(data[0]['lon'])
-                    result = (lat, lon)
-                    
-                    # Cache the result
-                    VintageMap._geocode_cache[cache_key] = result
-                    
-                    # Be respectful to the API - wait 1 second between requests
-                    sleep(1)
-                    
-                    return result
-        except Exception as e:
-            print(f"Geocoding error for {query}: {e}")
-        
-        # If geocoding fails, return Münster city center as fallback
-        fallback = (51.9607, 7.6261)
-        VintageMap._geocode_cache[cache_key] = fallback
-        return fallback
+    def geocode_location(supermarket, location, city=None):
+        """Geocode a location via geocoding.geocode_location (Nominatim, cached)."""
+        return geocoding.geocode_location(supermarket, location, city)
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, city=None):
         super().__init__(parent)
+        self.city = city or cities.current_city()
         
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
         
         self.web_view = QWebEngineView()
         self.web_view.setStyleSheet("background: #fdfbf7;")
+        # Calls made before Leaflet has loaded (e.g. a session restored at startup) are queued until then
+        self._page_loaded = False
+        self._pending_js = []
+        self.last_payload = [] # Markers of the last update_map(), kept for the session cache
+        self.web_view.loadFinished.connect(self._flush_pending_js)
         
         # Leaflet HTML with monochrome filter
         self.map_html = """
@@ -103,7 +64,7 @@ class VintageMap(QWidget):
             <div id="map"></div>
             <script>
                 var map = L.map('map', {
-                    center: [51.9607, 7.6261], // Center of Münster
+                    center: [__CENTER__], // Center of the edition's city
                     zoom: 12,
                     zoomControl: false,
                     attributionControl: false
@@ -137,10 +98,39 @@ class VintageMap(QWidget):
                         map.fitBounds(bounds, {padding: [30, 30]});
                     }
                 }
+
+                // Cheapest-store query: search radius, ranked stores (1, 2, ...) and per-item split stores (€)
+                function showStoreRanking(result) {
+                    markers.forEach(m => m.remove());
+                    markers = [];
+                    var circle = L.circle(result.center, {
+                        radius: result.radius_km * 1000,
+                        color: '#1a1a1a', weight: 1, dashArray: '4 4', fill: false
+                    }).addTo(map);
+                    markers.push(circle);
+                    markers.push(L.circleMarker(result.center, {radius: 5, color: '#1a1a1a', weight: 2, fill: false}).addTo(map));
+
+                    result.stores.forEach((s, i) => {
+                        var icon = L.divIcon({className: 'custom-div-icon', html: String(i + 1), iconSize: [24, 24], iconAnchor: [12, 12]});
+                        var marker = L.marker([s.lat, s.lng], {icon: icon, zIndexOffset: 1000 - i}).addTo(map);
+                        marker.bindPopup("<b>#" + (i + 1) + " " + s.supermarket + "</b><br>" + s.location +
+                            "<br>Basket: €" + s.basket_cost.toFixed(2) + " (" + s.items_available + "/" + result.items + " items)" +
+                            "<br>" + s.distance_km.toFixed(1) + " km");
+                        markers.push(marker);
+                    });
+                    result.split.forEach(p => {
+                        var icon = L.divIcon({className: 'custom-div-icon', html: '€', iconSize: [24, 24], iconAnchor: [12, 12]});
+                        var marker = L.marker([p.lat, p.lng], {icon: icon}).addTo(map);
+                        marker.bindPopup("<b>" + p.item + "</b><br>" + p.supermarket + ", " + p.location +
+                            "<br>Price: €" + p.price.toFixed(2));
+                        markers.push(marker);
+                    });
+                    map.fitBounds(circle.getBounds(), {padding: [20, 20]});
+                }
             </script>
         </body>
         </html>
-        """
+        """.replace("__CENTER__", "%f, %f" % cities.city_config(self.city)['center'])
         self.web_view.setHtml(self.map_html)
         layout.addWidget(self.web_view)
         self.setMinimumHeight(300)
@@ -148,21 +138,53 @@ class VintageMap(QWidget):
     def update_map(self, df: pd.DataFrame):
         """Update map with markers from DataFrame using API-based geocoding."""
         print(f"VintageMap.update_map called with {len(df)} records")
-        
+        with profiler.span("map.update", rows=len(df)):
+            self._update_markers(df)
+
+    def _update_markers(self, df):
         data = []
-        for _, row in df.iterrows():
+        for receipt in receipts.records(df):
             # Use API-based geocoding for each location
-            coords = self.geocode_location(row['supermarket'], row['location'])
+            coords = self.geocode_location(receipt.supermarket, receipt.location, self.city)
             if coords:
                 lat, lng = coords
                 data.append({
                     'lat': lat,
                     'lng': lng,
-                    'supermarket': row['supermarket'],
-                    'location': row['location'],
-                    'price': row['price']
+                    'supermarket': receipt.supermarket,
+                    'location': receipt.location,
+                    'price': float(receipt.price)
                 })
         
         print(f"Mapped {len(data)} markers")
+        self.show_markers(data)
+
+    def show_markers(self, data):
+        """Draws an already geocoded marker payload (list of dicts with lat, lng, supermarket, location, price)."""
+        self.last_payload = data
         js_code = f"updateMarkers({json.dumps(data)});"
-        self.web_view.page().runJavaScript(js_code)
+        self._run_js(js_code)
+
+    def _run_js(self, js_code):
+        if self._page_loaded:
+            self.web_view.page().runJavaScript(js_code)
+        else:
+            self._pending_js.append(js_code)
+
+    def _flush_pending_js(self, ok):
+        self._page_loaded = True
+        pending, self._pending_js = self._pending_js, []
+        for js_code in pending:
+            self.web_view.page().runJavaScript(js_code)
+
+    def show_store_ranking(self, result, item_count):
+        """Draws a store_compare.StoreComparison.cheapest() result: radius, ranked stores and split-plan stores."""
+        columns = ['supermarket', 'location', 'lat', 'lng']
+        payload = {
+            'center': list(result['center']),
+            'radius_km': result['radius_km'],
+            'items': item_count,
+            'stores': result['stores'][columns + ['basket_cost', 'items_available', 'distance_km']].to_dict('records'),
+            'split': result['split'][['item', 'price'] + columns].to_dict('records') if len(result['split']) else [],
+        }
+        self._run_js(f"showStoreRanking({json.dumps(payload, default=float)});")
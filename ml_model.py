@@ -3,26 +3,24 @@ import numpy as np
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import RidgeCV
 from datetime import datetime, timedelta
+import calendar_features
+import cities
+import profiler
+import receipts
 
-def get_recommendation(df):
+def build_features(df):
     """
-    Generates a recommendation based on historical price data using a simple linear regression model.
-    Returns a dictionary with recommendation string and confidence score.
+    Feature engineering shared by the recommendation model.
+    Returns (df, X, y, categorical_columns) where df is the sorted, encoded frame and X the numeric feature matrix.
     """
-    # Set random seed for reproducibility
-    np.random.seed(42)
-
-    if len(df) < 2:
-        return {"recommendation": "Not enough data for a recommendation.", "confidence": 0}
-
-    # Ensure 'date' column is datetime and sort
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values(by='date')
+    # Sort by the int32 day number (see receipts.py) and derive calendar features from it
+    df = receipts.compact(df).sort_values(by='day')
+    dates = receipts.dates(df)
 
     # Feature Engineering
-    df['day_of_week'] = df['date'].dt.dayofweek
-    df['day_of_year'] = df['date'].dt.dayofyear
-    df['month'] = df['date'].dt.month
+    df['day_of_week'] = dates.dayofweek
+    df['day_of_year'] = dates.dayofyear
+    df['month'] = dates.month
     
     # Calculate rolling average and volatility
     df['rolling_avg'] = df['price'].rolling(window=min(7, len(df)), min_periods=1).mean()
@@ -56,7 +54,10 @@ def get_recommendation(df):
 
     # Ensure all columns are numeric and handle any remaining non-numeric data
     X = X.apply(pd.to_numeric, errors='coerce').fillna(0)
+    return df, X, y, categorical_columns
 
+def fit_model(X, y):
+    """Scales the features and fits RidgeCV. Returns (scaler, X_scaled, model)."""
     # Feature Scaling - Fairness Training (as shown in notebook)
     # Math: z = (x - μ) / σ
     # This ensures all features are on a similar scale, making regularization fair
@@ -66,10 +67,7 @@ def get_recommendation(df):
     # Train Ridge Regression with Cross-Validation
     # Adjust CV based on number of samples
     n_samples = len(X_scaled)
-    if n_samples < 2:
-        # Should be caught above, but safe fallback
-        return {"recommendation": "Not enough data.", "confidence": 0}
-    elif n_samples < 5:
+    if n_samples < 5:
         # Use Leave-One-Out Cross-Validation (implied by cv=None for RidgeCV with some solvers) 
         # or just a smaller K. RidgeCV(cv=None) defaults to efficient LOOCV.
         cv_val = None 
@@ -77,26 +75,29 @@ def get_recommendation(df):
         cv_val = 5
 
     model = RidgeCV(alphas=[0.1, 1.0, 10.0], cv=cv_val)
-    model.fit(X_scaled, y)
+    with profiler.span("ml.fit", samples=n_samples):
+        model.fit(X_scaled, y)
+    return scaler, X_scaled, model
 
-    # Predict for the next 7 days
-    today = datetime.now()
-    future_dates = [today + timedelta(days=i) for i in range(7)]
-    
-    # Create future features, using the last known values for prediction
+def future_features(df, X, categorical_columns, future_dates):
+    """Builds the feature rows for future_dates, using the last known values for the non-calendar features."""
+    horizon = len(future_dates)
     last_row = df.iloc[-1]
+    # Calendar columns are looked up in the precomputed table instead of per-date timetuple() calls
+    days = [receipts.day_number(d) for d in future_dates]
+    calendar = calendar_features.features_for_days(days, ['day_of_year', 'day_of_week', 'month'])
     future_features_data = {
-        'day_of_year': [d.timetuple().tm_yday for d in future_dates],
-        'day_of_week': [d.weekday() for d in future_dates],
-        'month': [d.month for d in future_dates],
-        'rolling_avg': [last_row['rolling_avg']] * 7,
-        'price_volatility': [last_row['price_volatility']] * 7,
-        'weight_grams': [last_row['weight_grams']] * 7,
+        'day_of_year': calendar[:, 0],
+        'day_of_week': calendar[:, 1],
+        'month': calendar[:, 2],
+        'rolling_avg': [last_row['rolling_avg']] * horizon,
+        'price_volatility': [last_row['price_volatility']] * horizon,
+        'weight_grams': [last_row['weight_grams']] * horizon,
     }
     
     # Add one-hot encoded columns for future features
     for col in categorical_columns:
-        future_features_data[col] = [last_row[col]] * 7
+        future_features_data[col] = [last_row[col]] * horizon
 
     future_features_df = pd.DataFrame(future_features_data)
     
@@ -107,11 +108,37 @@ def get_recommendation(df):
     future_features_df = future_features_df[X.columns] # Ensure order is the same
 
     # Ensure all columns in future_features_df are numeric
-    future_features_df = future_features_df.apply(pd.to_numeric, errors='coerce').fillna(0)
+    return future_features_df.apply(pd.to_numeric, errors='coerce').fillna(0)
+
+def get_recommendation(df):
+    """
+    Generates a recommendation based on historical price data using a simple linear regression model.
+    Returns a dictionary with recommendation string and confidence score.
+    """
+    with profiler.span("ml.recommend", rows=len(df)):
+        return _get_recommendation(df)
+
+def _get_recommendation(df):
+    # Set random seed for reproducibility
+    np.random.seed(42)
+
+    if len(df) < 2:
+        return {"recommendation": "Not enough data for a recommendation.", "confidence": 0}
+
+    with profiler.span("ml.features"):
+        df, X, y, categorical_columns = build_features(df)
+
+    scaler, X_scaled, model = fit_model(X, y)
+
+    # Predict for the next 7 days
+    today = datetime.now()
+    future_dates = [today + timedelta(days=i) for i in range(7)]
+    future_features_df = future_features(df, X, categorical_columns, future_dates)
 
     # Scale future features and make predictions
     future_features_scaled = scaler.transform(future_features_df)
-    predictions = model.predict(future_features_scaled)
+    with profiler.span("ml.predict"):
+        predictions = model.predict(future_features_scaled)
     
     # Find best day to buy
     best_day_index = np.argmin(predictions)
@@ -134,3 +161,303 @@ def get_recommendation(df):
     recommendation_str += f"Best Price: {predicted_price:.2f} €\n"
     recommendation_str += f"Confidence: {confidence:.2f}%"
     return {"recommendation_header":recommendation_header_str, "recommendation": recommendation_str}
+
+# Forecast Configuration - Settings for the probabilistic forecast mode
+FORECAST_CONFIG = {
+    'horizon': 7,              # Days ahead
+    'n_resamples': 1000,       # Bootstrap resamples
+    'interval': 0.90,          # Width of the predictive interval
+    'chunk_size': 250,         # Resamples per worker when a process pool is used
+    'seed': 42,
+}
+
+def _bootstrap_chunk(solver, F, fitted, residuals, n_resamples, seed):
+    """
+    Runs n_resamples residual-bootstrap refits as matrix products.
+    solver is (X'X + αI)^-1 X' for the centered (scaled) training features, so refitting every
+    resample is one (p x n) @ (n x B) product instead of B separate model fits.
+    Returns the simulated future prices as a (horizon x B) array.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(fitted)
+    # Resampled targets: fitted values plus residuals drawn with replacement, one column per resample
+    Y = fitted[:, None] + residuals[rng.integers(0, n, size=(n, n_resamples))]
+    intercepts = Y.mean(axis=0)
+    coefs = solver @ (Y - intercepts)
+    # Parameter uncertainty (refit) plus observation noise (a fresh residual per future day)
+    noise = residuals[rng.integers(0, n, size=(F.shape[0], n_resamples))]
+    return F @ coefs + intercepts + noise
+
+def get_forecast(df, horizon=None, n_resamples=None, method="bootstrap", n_jobs=1):
+    """
+    Probabilistic version of get_recommendation.
+    Fits the same Ridge model, then estimates per-day predictive intervals either by residual bootstrap
+    (method="bootstrap", optionally spread over n_jobs processes) or from the analytic ridge variance
+    (method="analytic"). Returns a dictionary with dates, median/lower/upper prices, the probability
+    that each day is the cheapest of the horizon, and a recommendation string in get_recommendation's format.
+    """
+    with profiler.span("ml.forecast", rows=len(df), method=method):
+        return _get_forecast(df, horizon or FORECAST_CONFIG['horizon'],
+                             n_resamples or FORECAST_CONFIG['n_resamples'], method, n_jobs)
+
+def _get_forecast(df, horizon, n_resamples, method, n_jobs):
+    if len(df) < 3:
+        return {"recommendation": "Not enough data for a forecast.", "confidence": 0}
+
+    with profiler.span("ml.features"):
+        df, X, y, categorical_columns = build_features(df)
+    scaler, X_scaled, model = fit_model(X, y)
+
+    today = datetime.now()
+    future_dates = [today + timedelta(days=i) for i in range(horizon)]
+    F = scaler.transform(future_features(df, X, categorical_columns, future_dates))
+
+    # Closed-form ridge on the standardized (zero-mean) features: coef = (X'X + αI)^-1 X'(y - ȳ)
+    n, p = X_scaled.shape
+    gram = X_scaled.T @ X_scaled + model.alpha_ * np.eye(p)
+    solver = np.linalg.solve(gram, X_scaled.T)
+    y_values = y.to_numpy(dtype=float)
+    fitted = X_scaled @ (solver @ (y_values - y_values.mean())) + y_values.mean()
+
+    # Leverage-corrected residuals, so in-sample fit does not understate the noise level
+    leverage = np.clip(np.einsum('ij,ji->i', X_scaled, solver) + 1.0 / n, 0, 0.99)
+    residuals = (y_values - fitted) / np.sqrt(1.0 - leverage)
+    residuals -= residuals.mean()
+
+    rng_seed = FORECAST_CONFIG['seed']
+    with profiler.span("ml.forecast_sample", resamples=n_resamples):
+        if method == "analytic":
+            # Var[ŷ_f] = σ² (f'M X'X M f) with M = (X'X + αI)^-1, plus σ² observation noise
+            dof = max(n - np.trace(X_scaled @ solver) - 1, 1)
+            sigma2 = float(residuals @ residuals) / dof
+            mean = F @ (solver @ (y_values - y_values.mean())) + y_values.mean()
+            cov = sigma2 * (F @ solver @ solver.T @ F.T + np.eye(horizon) + 1.0 / n)
+            if sigma2 <= 1e-12 * max(float(y_values @ y_values) / n, 1.0):
+                # No residual noise (e.g. a constant price): the point forecast with zero-width intervals
+                samples = np.repeat(mean[:, None], n_resamples, axis=1)
+            else:
+                rng = np.random.default_rng(rng_seed)
+                samples = rng.multivariate_normal(mean, cov, size=n_resamples, method='cholesky').T
+        elif n_jobs and n_jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            chunk = FORECAST_CONFIG['chunk_size']
+            sizes = [min(chunk, n_resamples - start) for start in range(0, n_resamples, chunk)]
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                parts = pool.map(_bootstrap_chunk, [solver] * len(sizes), [F] * len(sizes),
+                                 [fitted] * len(sizes), [residuals] * len(sizes), sizes,
+                                 [rng_seed + i for i in range(len(sizes))])
+                samples = np.hstack(list(parts))
+        else:
+            samples = _bootstrap_chunk(solver, F, fitted, residuals, n_resamples, rng_seed)
+
+    # Probability that each day is the cheapest one of the horizon (share of resamples where it wins);
+    # a resample where several days tie for the minimum counts each of them with an equal share
+    cheapest = samples == samples.min(axis=0)
+    p_cheapest = (cheapest / cheapest.sum(axis=0)).sum(axis=1) / samples.shape[1]
+    tail = (1.0 - FORECAST_CONFIG['interval']) / 2
+    lower, median, upper = np.quantile(samples, [tail, 0.5, 1.0 - tail], axis=1)
+
+    best_day_index = int(np.argmax(p_cheapest))
+    best_day = future_dates[best_day_index].strftime("%A")
+    probability = 100.0 * p_cheapest[best_day_index]
+
+    recommendation_str = ""
+    recommendation_str += f"Best day to buy: {best_day}\n"
+    recommendation_str += f"Best Price: {median[best_day_index]:.2f} €\n"
+    recommendation_str += f"Confidence: {probability:.2f}%"
+    return {
+        "recommendation_header": "Forecast",
+        "recommendation": recommendation_str,
+        "dates": future_dates,
+        "median": median,
+        "lower": lower,
+        "upper": upper,
+        "p_cheapest": p_cheapest,
+        "best_day_index": best_day_index,
+    }
+
+# Seasonal Forecast Configuration - Long-horizon recursive forecasts on daily price series
+SEASONAL_CONFIG = {
+    'horizons': [7, 30, 90],       # Choices offered in the GUI
+    'lags': 7,                     # Daily price lags fed back recursively (covers one weekly cycle)
+    'alphas': [0.1, 1.0, 10.0, 100.0, 1000.0], # fit_model's grid plus stronger shrinkage, chosen by GCV
+    'min_observations': 3,         # Distinct receipt days needed for a forecast
+    'min_calendar_observations': 20, # Receipt days needed before calendar effects are fitted
+    'max_gap_days': 365,           # Longest stretch between the last receipt and today that is simulated
+    'min_price_movement': 0.01,    # Forecast range (€) below which no day is recommended
+    'price_band': 2.0,             # Recursive predictions stay within [min / band, max * band] of the observed prices
+}
+
+def _daily_series(df):
+    """Daily mean price of one item from its first to its last receipt day, forward-filled over gaps."""
+    days = df['day'].to_numpy(dtype=np.int64)
+    first_day = days.min()
+    offsets = days - first_day
+    sums = np.bincount(offsets, weights=df['price'].to_numpy(dtype=np.float64))
+    counts = np.bincount(offsets)
+    observed = counts > 0
+    prices = np.where(observed, sums / np.maximum(counts, 1), np.nan)
+    # Forward fill via the index of the last observed day
+    last_seen = np.maximum.accumulate(np.where(observed, np.arange(len(prices)), 0))
+    return int(first_day), prices[last_seen], observed
+
+def _lag_matrix(series, lags):
+    """Row t holds series[t-lags .. t-1] (oldest first); days before the start repeat the first price."""
+    padded = np.concatenate([np.full(lags, series[0]), series])
+    return np.lib.stride_tricks.sliding_window_view(padded, lags)[:len(series)]
+
+def _seasonal_design(lag_windows, calendar):
+    """Model inputs: last price, price one week ago, mean of the lag window, then the calendar table columns."""
+    return np.column_stack([lag_windows[:, -1], lag_windows[:, 0], lag_windows.mean(axis=1), calendar])
+
+def _fit_seasonal(X, y, n_lag_columns, raw_prices):
+    """
+    Ridge fit on standardized features with the alpha chosen by generalized cross-validation (via one SVD).
+    Items with fewer than 'min_calendar_observations' receipt days only use the lag columns, since their
+    calendar effects cannot be estimated. Returns (weights, intercept, cv_rmse) on the original feature scale;
+    when GCV is undefined (too few days) cv_rmse falls back to the spread of the individual receipt prices.
+    """
+    n = len(y)
+    columns = X.shape[1] if n >= SEASONAL_CONFIG['min_calendar_observations'] else n_lag_columns
+    mean, std = X[:, :columns].mean(axis=0), X[:, :columns].std(axis=0)
+    std[std == 0] = 1.0
+    Z = (X[:, :columns] - mean) / std
+    y_mean = y.mean()
+    U, S, Vt = np.linalg.svd(Z, full_matrices=False)
+    Uty = U.T @ (y - y_mean)
+    best = None
+    for alpha in SEASONAL_CONFIG['alphas']:
+        shrink = S / (S ** 2 + alpha)
+        fitted = U @ (S * shrink * Uty) + y_mean
+        # GCV: residual error inflated by the effective degrees of freedom (+1 for the intercept)
+        slack = 1.0 - (np.sum(S * shrink) + 1.0) / n
+        gcv = np.mean((y - fitted) ** 2) / slack ** 2 if slack > 0 else np.inf
+        if best is None or gcv < best[0]:
+            best = (gcv, Vt.T @ (shrink * Uty))
+    weights = np.zeros(X.shape[1])
+    weights[:columns] = best[1] / std
+    cv_rmse = float(np.sqrt(best[0])) if np.isfinite(best[0]) else float(np.std(raw_prices))
+    return weights, y_mean - mean @ weights[:columns], cv_rmse
+
+def get_seasonal_forecasts(frames, horizon=None, today=None, city=None):
+    """
+    Seasonal long-horizon forecasts for several items at once. frames maps item name -> receipts DataFrame.
+    Each item gets a ridge model on its daily price series (lags + precomputed calendar, holiday and
+    promotion-week features). The forecast is recursive: every predicted day is fed back as the next
+    day's lag. The recursion runs once for all items as (items x features) array operations, so a
+    longer horizon only adds a few vectorized steps. Holidays are those of `city` (default: the current city).
+    Returns item name -> result dictionary.
+    """
+    horizon = horizon or SEASONAL_CONFIG['horizons'][0]
+    with profiler.span("ml.seasonal", items=len(frames), horizon=horizon):
+        return _get_seasonal_forecasts(frames, horizon, today or datetime.now(), cities.city_config(city)['holiday_region'])
+
+def get_seasonal_forecast(df, horizon=None, today=None, city=None):
+    """Single-item convenience wrapper around get_seasonal_forecasts."""
+    return get_seasonal_forecasts({None: df}, horizon, today, city)[None]
+
+def _get_seasonal_forecasts(frames, horizon, today, region):
+    lags = SEASONAL_CONFIG['lags']
+    first_forecast_day = receipts.day_number(today)
+    results = {}
+    names, models, windows, start_days, histories, bands = [], [], [], [], [], []
+
+    with profiler.span("ml.seasonal_fit"):
+        for name, df in frames.items():
+            if df.empty:
+                results[name] = {"recommendation": "Not enough data for a forecast.", "confidence": 0}
+                continue
+            df = receipts.compact(df)
+            first_day, series, observed = _daily_series(df)
+            # Several receipts on one day are a single training row
+            if observed.sum() < SEASONAL_CONFIG['min_observations']:
+                results[name] = {"recommendation": "Not enough data for a forecast.", "confidence": 0}
+                continue
+            if first_day >= first_forecast_day:
+                # Nothing is known before the forecast start, so there is no history to recurse from
+                results[name] = {"recommendation": "No price history before the forecast start.", "confidence": 0}
+                continue
+            lag_windows = _lag_matrix(series, lags)
+            calendar = calendar_features.features_for_days(np.arange(first_day, first_day + len(series)), region=region)
+            # Train only on days with receipts; forward-filled days serve as lag inputs
+            X = _seasonal_design(lag_windows, calendar)[observed]
+            weights, intercept, cv_rmse = _fit_seasonal(X, series[observed], X.shape[1] - calendar.shape[1],
+                                                       df['price'].to_numpy(dtype=np.float64))
+            names.append(name)
+            models.append((weights, intercept, cv_rmse, float(series[observed].mean())))
+            bands.append((float(series[observed].min()), float(series[observed].max())))
+            windows.append(np.concatenate([lag_windows[-1][1:], series[-1:]]))
+            last_day = first_day + len(series) - 1
+            histories.append((first_day, series))
+            start_days.append(max(last_day + 1, first_forecast_day - SEASONAL_CONFIG['max_gap_days']))
+
+    if not names:
+        return results
+
+    W = np.array([model[0] for model in models])
+    b = np.array([model[1] for model in models])
+    # Few receipt days can yield an unstable (explosive) lag model; the band keeps the recursion bounded
+    low = np.array([band[0] for band in bands]) / SEASONAL_CONFIG['price_band']
+    high = np.array([band[1] for band in bands]) * SEASONAL_CONFIG['price_band']
+    window = np.array(windows)                 # (items x lags), newest price last
+    start_days = np.array(start_days)
+    end_day = first_forecast_day + horizon
+    first_day = min(start_days.min(), first_forecast_day)
+    calendar = calendar_features.features_for_days(np.arange(first_day, end_day), region=region)
+    forecast = np.full((len(names), horizon), np.nan)
+    # Days that already have receipts (history reaching past `today`) keep their known price
+    for i, (history_start, series) in enumerate(histories):
+        known = series[first_forecast_day - history_start:first_forecast_day - history_start + horizon]
+        forecast[i, :len(known)] = known
+
+    with profiler.span("ml.seasonal_recurse", steps=end_day - first_day):
+        for step, day in enumerate(range(first_day, end_day)):
+            # Items whose history ends later than this day are left untouched until their own start
+            active = start_days <= day
+            if not active.any():
+                continue
+            X = _seasonal_design(window[active], np.broadcast_to(calendar[step], (active.sum(), calendar.shape[1])))
+            predicted = np.clip(np.einsum('ij,ij->i', X, W[active]) + b[active], np.maximum(low[active], 0.01), high[active])
+            window[active] = np.column_stack([window[active][:, 1:], predicted])
+            if day >= first_forecast_day:
+                forecast[active, day - first_forecast_day] = predicted
+
+    future_dates = [today + timedelta(days=i) for i in range(horizon)]
+    for i, name in enumerate(names):
+        predictions = forecast[i]
+        best_day_index = int(np.argmin(predictions))
+        # Within a week the weekday is unambiguous; longer horizons need the date
+        best_day = future_dates[best_day_index].strftime("%A" if horizon <= 7 else "%A, %d %b")
+        _weights, _intercept, cv_rmse, mean_price = models[i]
+        # Confidence from the cross-validated error relative to the typical price
+        confidence = max(0.0, min(100.0, 100.0 * (1.0 - cv_rmse / mean_price)))
+        # A forecast that moves less than its own error (e.g. lag-only models flattening out) has no best day
+        signal = predictions.max() - predictions.min() > max(cv_rmse, SEASONAL_CONFIG['min_price_movement'])
+        recommendation_str = ""
+        if signal:
+            recommendation_str += f"Best day to buy: {best_day}\n"
+            recommendation_str += f"Best Price: {predictions[best_day_index]:.2f} €\n"
+        else:
+            recommendation_str += f"No seasonal signal: about {predictions.mean():.2f} € throughout\n"
+        recommendation_str += f"Confidence: {confidence:.2f}%"
+        results[name] = {
+            "recommendation_header": "Seasonal Forecast",
+            "recommendation": recommendation_str,
+            "dates": future_dates,
+            "predictions": predictions,
+            "best_day_index": best_day_index,
+            "seasonal_signal": bool(signal),
+            "confidence": confidence,
+        }
+    return results
+
+def get_prediction(df, forecast_mode=False, horizon=None, city=None):
+    """
+    Result for the GUI's current mode: the seasonal forecast for horizons beyond a week, otherwise the
+    probabilistic forecast or the point recommendation. Shared by search_item and the prefetch loader.
+    """
+    if horizon and horizon > FORECAST_CONFIG['horizon']:
+        return get_seasonal_forecast(df, horizon, city=city)
+    if forecast_mode:
+        return get_forecast(df)
+    return get_recommendation(df)
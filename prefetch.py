@@ -0,0 +1,216 @@
+import asyncio
+import threading
+import time
+from collections import Counter, OrderedDict
+import pandas as pd
+import database
+import ml_model
+import profiler
+import receipts
+
+# Prefetch loader: an asyncio event loop on a background thread that speculatively fetches and featurizes
+# the searches the user is likely to run next (the item selected in the dropdown, recent searches), so
+# search_item usually finds the receipts and the recommendation already in memory. No Qt imports here.
+
+# Prefetch Configuration - Queue bound, concurrency and memory cap
+PREFETCH_CONFIG = {
+    'queue_size': 8,              # Pending candidates; the oldest one is dropped when a new one arrives
+    'concurrency': 2,             # Candidates loaded at the same time
+    'max_bytes': 64 * 1024 ** 2,  # Memory cap of the prefetched frames (least recently used evicted first)
+    'max_age_seconds': 300,       # Older prefetched data is refetched instead of served
+    'recent_searches': 5,         # Recent searches kept warm
+    'max_supermarkets': 8,        # Frames of a prefetched item (the item, then its supermarket slices) given a warm recommendation
+}
+
+_STATS = ['hits', 'misses', 'warm_results', 'fetched', 'dropped', 'evicted', 'failed']
+
+
+def _slice(df, mask):
+    """Rows of df as a standalone receipts frame, as if they had been queried on their own."""
+    part = df[mask].reset_index(drop=True)
+    for column in part.columns:
+        if isinstance(part[column].dtype, pd.CategoricalDtype):
+            part[column] = part[column].cat.remove_unused_categories()
+    return part
+
+
+class PrefetchLoader:
+    """
+    Speculative loader with a bounded asyncio.Queue of (item, supermarket) candidates.
+
+    request() may be called from any thread and never blocks. `concurrency` worker tasks run the blocking
+    database query and the model in the loop's default executor; a search issued while the same query is
+    in flight shares its round-trip through database's single-flight. An unfiltered item query also yields
+    every supermarket's rows, so those slices are stored too without further queries. Frames are kept in
+    an LRU capped at PREFETCH_CONFIG['max_bytes'] (receipts.bytes_per_receipt x rows); `stats` counts hits,
+    misses, loads, drops and evictions.
+    """
+
+    def __init__(self, city=None):
+        self.city = city
+        self.stats = Counter()          # _STATS counters
+        self._lock = threading.Lock()   # Guards _entries, _bytes, _recent and stats across threads
+        self._entries = OrderedDict()   # (item, supermarket) -> {'df', 'results': {mode: result}, 'bytes', 'loaded_at'}
+        self._bytes = 0
+        self._recent = Counter()        # (item, supermarket) -> number of searches, for ranking candidates
+        self._pending = set()           # (key, mode) queued or loading; only touched on the loop thread
+        self._queue = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="prefetch", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue(maxsize=PREFETCH_CONFIG['queue_size'])
+        for _ in range(PREFETCH_CONFIG['concurrency']):
+            self._loop.create_task(self._worker())
+        try:
+            self._loop.run_forever()
+        finally:
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+    def close(self):
+        """Stops the loop thread; queued candidates are dropped, a running query is not waited for."""
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=1.0)
+
+    # --- GUI side -------------------------------------------------------------------------------------
+
+    def request(self, candidates, forecast_mode=False, horizon=None):
+        """Queues (item, supermarket) candidates, most likely first, to be warmed for the given mode."""
+        mode = (forecast_mode, horizon)
+        if self._loop.is_closed():
+            return
+        for key in candidates:
+            self._loop.call_soon_threadsafe(self._enqueue, tuple(key), mode)
+
+    def take(self, item_name, supermarket=None, forecast_mode=False, horizon=None):
+        """
+        Prefetched (df, result) of a search, or None on a miss. result is None when the receipts are
+        warm but the model was not run for this mode.
+        """
+        key = (item_name, supermarket or None)
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            result = entry['results'].get((forecast_mode, horizon))
+            if result is not None:
+                self.stats['warm_results'] += 1
+            return entry['df'], result
+
+    def searched(self, item_name, supermarket, df, forecast_mode, horizon, result):
+        """Records a finished search: keeps its data warm and re-warms the other frequent recent searches."""
+        key = (item_name, supermarket or None)
+        self._store(key, df, (forecast_mode, horizon), result)
+        with self._lock:
+            self._recent[key] += 1
+            recent = [candidate for candidate, _count in self._recent.most_common(PREFETCH_CONFIG['recent_searches'])]
+        self.request([candidate for candidate in recent if candidate != key], forecast_mode, horizon)
+
+    def remember(self, keys):
+        """Seeds the recent searches, e.g. from the session cache of the previous run."""
+        with self._lock:
+            for key in keys:
+                self._recent[(key[0], key[1] or None)] += 1
+
+    def metrics(self):
+        """Hit rate and memory use of the prefetch cache."""
+        with self._lock:
+            stats = {name: self.stats[name] for name in _STATS}
+            lookups = stats['hits'] + stats['misses']
+            return dict(stats, lookups=lookups, hit_rate=stats['hits'] / lookups if lookups else 0.0,
+                        entries=len(self._entries), bytes=self._bytes, max_bytes=PREFETCH_CONFIG['max_bytes'])
+
+    # --- Loop side ------------------------------------------------------------------------------------
+
+    def _enqueue(self, key, mode):
+        if (key, mode) in self._pending or self._warm(key, mode):
+            return
+        if self._queue.full():
+            # The newest candidates reflect the current selection best
+            stale = self._queue.get_nowait()
+            self._queue.task_done()
+            self._pending.discard(stale)
+            self._count('dropped')
+        self._pending.add((key, mode))
+        self._queue.put_nowait((key, mode))
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            key, mode = await self._queue.get()
+            try:
+                if not self._warm(key, mode):
+                    await loop.run_in_executor(None, self._load, key, mode)
+            except Exception as e:
+                print(f"Prefetch of {key} failed: {e}")
+                self._count('failed')
+            finally:
+                self._pending.discard((key, mode))
+                self._queue.task_done()
+
+    def _load(self, key, mode):
+        """Runs in an executor thread: fetches (unless warm) and featurizes a candidate and its supermarket slices."""
+        item_name, supermarket = key
+        with profiler.span("prefetch.load", item=item_name, supermarket=supermarket):
+            with self._lock:
+                entry = self._fresh(key)
+            if entry is not None:
+                df = entry['df']
+            else:
+                df = database.get_prices_by_item_and_supermarket(item_name, supermarket, self.city)
+                self._count('fetched')
+            frames = {key: df}
+            if supermarket is None and not df.empty:
+                # The unfiltered query holds the rows of every supermarket; slice them instead of querying again
+                counts = df['supermarket'].value_counts()
+                for name in counts.index[counts > 0]:
+                    frames[(item_name, name)] = _slice(df, (df['supermarket'] == name).to_numpy())
+            for i, (frame_key, frame) in enumerate(frames.items()):
+                warm_result = i < PREFETCH_CONFIG['max_supermarkets']
+                result = ml_model.get_prediction(frame, *mode, city=self.city) if warm_result else None
+                self._store(frame_key, frame, mode, result)
+
+    # --- Shared ---------------------------------------------------------------------------------------
+
+    def _fresh(self, key):
+        """Entry of key if it is younger than max_age_seconds (caller holds the lock)."""
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry['loaded_at'] > PREFETCH_CONFIG['max_age_seconds']:
+            return None
+        return entry
+
+    def _warm(self, key, mode):
+        with self._lock:
+            entry = self._fresh(key)
+            return entry is not None and mode in entry['results']
+
+    def _store(self, key, df, mode, result):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry['df'] is not df:
+                if entry is not None:
+                    self._bytes -= entry['bytes']
+                size = int(receipts.bytes_per_receipt(df) * len(df))
+                entry = {'df': df, 'results': {}, 'bytes': size, 'loaded_at': time.monotonic()}
+                self._bytes += size
+            if result is not None:
+                entry['results'][mode] = result
+            self._entries[key] = entry
+            while self._bytes > PREFETCH_CONFIG['max_bytes'] and self._entries:
+                _key, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted['bytes']
+                self.stats['evicted'] += 1
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
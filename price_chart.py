@@ -2,46 +2,9 @@ from PySide6.QtWidgets import QWidget, QVBoxLayout
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import pandas as pd
-import matplotlib.dates as mdates
-import matplotlib.ticker as mticker
 import matplotlib.pyplot as plt # Import pyplot for event handling
-
-# Chart Styling Configuration - Centralized styling (Vintage Newspaper Theme)
-CHART_STYLE = {
-    # Colors (matching vintage newspaper aesthetic from style.qss)
-    'background_color': '#fdfbf7',  # Paper color
-    'ink_color': '#1a1a1a',          # Ink color
-    'grey_color': '#666666',          # Muted grey for placeholders
-    
-    # Line and marker styling
-    'line_width': 2,
-    'line_color': '#1a1a1a',
-    'marker_style': 'o',
-    'marker_size': 4,
-    'marker_face_color': 'white',
-    'marker_edge_color': '#1a1a1a',
-    
-    # Grid styling
-    'grid_linestyle': '--',
-    'grid_alpha': 0.3,
-    'grid_color': '#1a1a1a',
-    
-    # Fonts
-    'font_family': 'Noto Serif',
-    'tick_font_size': 8,
-    'annotation_font_size': 8,
-    
-    # Axis styling
-    'y_tick_interval': 0.2,
-    
-    # Annotation styling
-    'annotation_box_style': 'round,pad=0.5',
-    'annotation_bg_color': 'white',
-    'annotation_edge_color': 'k',
-    'annotation_line_width': 1,
-    'annotation_alpha': 0.7,
-    'annotation_offset': 10,
-}
+import profiler
+from chart_render import CHART_STYLE, draw_price_history, draw_index
 
 class PriceChart(QWidget):
     def __init__(self, parent=None):
@@ -61,83 +24,42 @@ class PriceChart(QWidget):
         # Connect hover event
         self.canvas.mpl_connect('motion_notify_event', self.on_hover)
 
-    def plot(self, df):
+    def plot(self, df, forecast=None, promotions=None):
         print(f"PriceChart.plot called with {len(df)} records")
-        self.df = df # Store the dataframe
-        self.figure.clear() # Clear the figure
-        self.annot = None  # Reset annotation when clearing to avoid orphaned axes reference
-        self.ax = self.figure.add_subplot(111) # Re-assign ax after clearing the figure
-        # Set facecolor again after clear
-        self.figure.set_facecolor(CHART_STYLE['background_color'])
-        self.ax.set_facecolor(CHART_STYLE['background_color'])
-        
-        # Remove top and right spines for a cleaner look
-        self.ax.spines['top'].set_visible(False)
-        self.ax.spines['right'].set_visible(False)
-        self.ax.spines['left'].set_color(CHART_STYLE['ink_color'])
-        self.ax.spines['bottom'].set_color(CHART_STYLE['ink_color'])
+        with profiler.span("chart.draw", rows=len(df)):
+            self._draw(df, forecast, promotions)
 
-        if not self.df.empty:
+    def _draw(self, df, forecast=None, promotions=None):
+        self.annot = None  # Reset annotation when clearing to avoid orphaned axes reference
+        if not df.empty:
             print("Plotting data...")
-            self.df['date'] = pd.to_datetime(self.df['date'])
-            self.df = self.df.sort_values(by='date')
-            
-            # Use 'step' plot with 'post' (equivalent to stepAfter)
-            # Use ink-black for the line
-            self.line, = self.ax.step(self.df['date'], self.df['price'], where='post', 
-                                     color=CHART_STYLE['line_color'], 
-                                     linewidth=CHART_STYLE['line_width'], 
-                                     marker=CHART_STYLE['marker_style'], 
-                                     markersize=CHART_STYLE['marker_size'], 
-                                     markerfacecolor=CHART_STYLE['marker_face_color'], 
-                                     markeredgecolor=CHART_STYLE['marker_edge_color'])
-            
-            # Set x-axis tick labels
-            self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-            self.ax.tick_params(axis='x', labelsize=CHART_STYLE['tick_font_size'], 
-                              colors=CHART_STYLE['ink_color'], 
-                              labelfontfamily=CHART_STYLE['font_family'])
-            self.ax.tick_params(axis='y', labelsize=CHART_STYLE['tick_font_size'], 
-                              colors=CHART_STYLE['ink_color'], 
-                              labelfontfamily=CHART_STYLE['font_family'])
-            
-            # Set y-axis interval
-            self.ax.yaxis.set_major_locator(mticker.MultipleLocator(CHART_STYLE['y_tick_interval']))
-            
-            # Add grid lines (horizontal only, dashed)
-            self.ax.yaxis.grid(True, linestyle=CHART_STYLE['grid_linestyle'], 
-                             alpha=CHART_STYLE['grid_alpha'], 
-                             color=CHART_STYLE['grid_color'])
-            self.ax.xaxis.grid(False)
-
-            self.figure.tight_layout()
-
-        else:
-            self.ax.text(0.5, 0.5, "Awaiting data points...",
-                    horizontalalignment='center',
-                    verticalalignment='center',
-                    transform=self.ax.transAxes,
-                    fontfamily='serif',
-                    fontstyle='italic',
-                    color=CHART_STYLE['grey_color'])
-            
-            # Hide axes for empty state
-            self.ax.set_axis_off()
-
+        # Shared with the headless report renderer (chart_render.py)
+        self.ax, self.df, self.line = draw_price_history(self.figure, df, forecast, promotions)
         self.canvas.draw()
 
+    def plot_index(self, index):
+        """Plots a basket index (Series, or DataFrame with one column per supermarket) as step lines."""
+        print(f"PriceChart.plot_index called with {len(index)} points")
+        if isinstance(index, pd.Series):
+            index = index.to_frame()
+        with profiler.span("chart.draw_index", rows=len(index)):
+            self.df = pd.DataFrame() # Hover annotations only apply to receipt plots
+            self.annot = None
+            self.ax = draw_index(self.figure, index)
+            self.canvas.draw()
+
     def on_hover(self, event):
         if event.inaxes == self.ax and not self.df.empty:
             cont, ind = self.line.contains(event)
             if cont:
                 data_index = ind['ind'][0]
                 
-                date = self.df['date'].iloc[data_index]
+                day = self.df['day'].iloc[data_index]
                 price = self.df['price'].iloc[data_index]
                 supermarket = self.df['supermarket'].iloc[data_index]
 
-                # Determine annotation position dynamically
-                xdata = mdates.date2num(date)
+                # Determine annotation position dynamically (day numbers are Matplotlib date numbers)
+                xdata = float(day)
                 ydata = price
                 
                 # Default text offset and alignment
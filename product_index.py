@@ -0,0 +1,155 @@
+import re
+import unicodedata
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+import profiler
+
+# Product Index Configuration - Centralized matching thresholds
+INDEX_CONFIG = {
+    'ngram_size': 3,            # Trigrams
+    'match_threshold': 0.55,    # Minimum Dice score for a fuzzy "did you mean" match
+    'variant_threshold': 0.75,  # Minimum Dice score for two names to count as variants of one product
+    'max_results': 10,
+}
+
+# Pack sizes such as "500g", "1,5 l" or "10 pcs" do not identify the product itself
+_QUANTITY_PATTERN = re.compile(r"\b\d+(?:[.,]\d+)?\s*(?:g|gr|kg|ml|cl|l|ltr|pcs|pc|st|stk|x)\b")
+_SEPARATOR_PATTERN = re.compile(r"[^0-9a-z%.]+")
+
+
+def normalize_name(name):
+    """Lower-cases, strips accents and unifies separators: 'EIER M/L' and 'Eier m-l' both become 'eier m l'."""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    text = _SEPARATOR_PATTERN.sub(" ", text)
+    return " ".join(text.split())
+
+
+def variant_key(name):
+    """Normalized name without pack sizes and with sorted tokens, so word order and package size are ignored."""
+    text = _QUANTITY_PATTERN.sub(" ", normalize_name(name))
+    return " ".join(sorted(set(text.split())))
+
+
+def _ngrams(text, n=INDEX_CONFIG['ngram_size']):
+    """Character n-grams of a normalized string, padded so short words and word starts still match."""
+    padded = f"  {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class ProductIndex:
+    """
+    Precomputed lookup structure over all distinct item names.
+    Holds normalized names, a trigram -> item id inverted index and receipt counts, so fuzzy search
+    and variant lookups are a handful of numpy operations instead of a scan over every name.
+    """
+
+    def __init__(self, item_counts):
+        with profiler.span("product_index.build", items=len(item_counts)):
+            # Sort by receipt count so ties in score favour frequently bought items
+            ordered = sorted(item_counts.items(), key=lambda kv: (-kv[1], kv[0]))
+            self.names = [name for name, _count in ordered]
+            self.counts = np.array([count for _name, count in ordered], dtype=np.int32)
+            self.normalized = [normalize_name(name) for name in self.names]
+            self._ids = {name: i for i, name in enumerate(self.names)}
+            self._by_normalized = {}
+            for i, text in enumerate(self.normalized):
+                self._by_normalized.setdefault(text, i)
+
+            postings = defaultdict(list)
+            ngram_counts = np.zeros(len(self.names), dtype=np.int32)
+            for i, text in enumerate(self.normalized):
+                grams = _ngrams(text)
+                ngram_counts[i] = len(grams)
+                for gram in grams:
+                    postings[gram].append(i)
+            self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+            self._ngram_counts = ngram_counts
+
+            self._variant_groups = defaultdict(list)
+            for i, name in enumerate(self.names):
+                self._variant_groups[variant_key(name)].append(i)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def count(self, name):
+        i = self._ids.get(name)
+        return 0 if i is None else int(self.counts[i])
+
+    def _scores(self, query):
+        """Dice coefficient between the query's trigrams and every indexed name (vectorized via bincount)."""
+        grams = _ngrams(normalize_name(query))
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not lists:
+            return np.zeros(len(self.names))
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.names))
+        return 2.0 * shared / (len(grams) + self._ngram_counts)
+
+    def search(self, query, limit=INDEX_CONFIG['max_results'], threshold=0.0):
+        """Returns [(name, score)] of the best fuzzy matches, ranked by score and then receipt count."""
+        if not query or not self.names:
+            return []
+        scores = self._scores(query)
+        candidates = np.flatnonzero(scores > threshold)
+        if len(candidates) == 0:
+            return []
+        # Stable sort on -score keeps the count ordering of the id space for equal scores
+        order = candidates[np.argsort(-scores[candidates], kind="stable")][:limit]
+        return [(self.names[i], float(scores[i])) for i in order]
+
+    def exact_match(self, query):
+        """Indexed name equal to the typed text, or to it after normalization (case, separators), else None."""
+        if query in self._ids:
+            return query
+        i = self._by_normalized.get(normalize_name(query))
+        return self.names[i] if i is not None else None
+
+    def best_match(self, query):
+        """Resolves typed text to an indexed name: exact, then normalized, then best fuzzy match (or None)."""
+        exact = self.exact_match(query)
+        if exact is not None:
+            return exact
+        results = self.search(query, limit=1, threshold=INDEX_CONFIG['match_threshold'])
+        return results[0][0] if results else None
+
+    def variants(self, name):
+        """All names that describe the same product: same variant key or near-identical spelling."""
+        ids = set(self._variant_groups.get(variant_key(name), []))
+        for match, _score in self.search(name, limit=INDEX_CONFIG['max_results'],
+                                        threshold=INDEX_CONFIG['variant_threshold']):
+            ids.add(self._ids[match])
+        return [self.names[i] for i in sorted(ids)]
+
+
+def add_unit_prices(df):
+    """Adds a 'unit_price' column (EUR per gram or ml) in one vectorized step; NaN where weight is unknown."""
+    if df.empty:
+        return df
+    weight = pd.to_numeric(df['weight_grams'], errors='coerce')
+    df['unit_price'] = (pd.to_numeric(df['price'], errors='coerce') / weight.where(weight > 0)).astype(float)
+    return df
+
+
+def compare_variants(df):
+    """
+    Summarizes several variants of a product side by side.
+    Returns one row per item_name_en with receipt count, median price, median unit price and last purchase date.
+    """
+    if df.empty:
+        return pd.DataFrame()
+    if 'unit_price' not in df.columns:
+        df = add_unit_prices(df)
+    summary = df.groupby('item_name_en', observed=True).agg(
+        receipts=('price', 'size'),
+        median_price=('price', 'median'),
+        median_unit_price=('unit_price', 'median'),
+        last_day=('day', 'max'),
+    )
+    return summary.sort_values(['median_unit_price', 'median_price'])
@@ -0,0 +1,205 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+# Profiling Configuration - Centralized settings for the instrumentation layer
+PROFILER_CONFIG = {
+    'max_spans': 2000,          # Size of the in-memory ring buffer (oldest spans are dropped first)
+    'profile_top_n': 25,        # Number of functions kept from a cProfile capture
+    'memory_top_n': 15,         # Number of allocation sites kept from a tracemalloc capture
+}
+
+# Spans are recorded unless DONERPRICER_TRACE=0 is set
+_enabled = os.environ.get("DONERPRICER_TRACE", "1") != "0"
+_spans = deque(maxlen=PROFILER_CONFIG['max_spans'])
+_lock = threading.Lock()
+
+# Opt-in capture state: armed once from the diagnostics panel, or always with DONERPRICER_PROFILE=1
+_capture_always = os.environ.get("DONERPRICER_PROFILE", "0") == "1"
+_capture_armed = False
+last_capture = None
+
+
+class _Span:
+    """Times a block of code and appends (name, category, start, duration, thread, args) to the ring buffer."""
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter_ns() - self.start
+        with _lock:
+            _spans.append((self.name, self.category, self.start, duration, threading.get_ident(), self.args))
+        return False
+
+
+class _NullSpan:
+    """Shared no-op context manager returned while tracing is disabled."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, category="app", **args):
+    """Returns a context manager timing the wrapped block, e.g. `with profiler.span("db.fetch"):`."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def set_enabled(enabled):
+    """Turns span recording on or off at runtime."""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled():
+    return _enabled
+
+
+def get_spans():
+    """Returns a snapshot of the ring buffer, oldest first."""
+    with _lock:
+        return list(_spans)
+
+
+def clear():
+    with _lock:
+        _spans.clear()
+
+
+def summary():
+    """
+    Aggregates the ring buffer per span name.
+    Returns a list of dicts (name, count, last_ms, mean_ms, max_ms) sorted by total time spent.
+    """
+    stats = {}
+    for name, _category, _start, duration, _tid, _args in get_spans():
+        entry = stats.setdefault(name, {"name": name, "count": 0, "total_ns": 0, "max_ns": 0, "last_ns": 0})
+        entry["count"] += 1
+        entry["total_ns"] += duration
+        entry["max_ns"] = max(entry["max_ns"], duration)
+        entry["last_ns"] = duration
+
+    rows = []
+    for entry in sorted(stats.values(), key=lambda e: e["total_ns"], reverse=True):
+        rows.append({
+            "name": entry["name"],
+            "count": entry["count"],
+            "last_ms": entry["last_ns"] / 1e6,
+            "mean_ms": entry["total_ns"] / entry["count"] / 1e6,
+            "max_ms": entry["max_ns"] / 1e6,
+        })
+    return rows
+
+
+def to_chrome_trace():
+    """Converts the ring buffer into the Chrome trace event format (chrome://tracing, Perfetto)."""
+    pid = os.getpid()
+    events = []
+    for name, category, start, duration, tid, args in get_spans():
+        events.append({
+            "name": name,
+            "cat": category,
+            "ph": "X",  # Complete event: start timestamp + duration
+            "ts": start / 1000,
+            "dur": duration / 1000,
+            "pid": pid,
+            "tid": tid,
+            "args": {key: str(value) for key, value in args.items()},
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(path):
+    """Writes the current spans as Chrome trace JSON to the given path."""
+    trace = to_chrome_trace() # Snapshot taken under the lock
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f)
+    print(f"Exported {len(trace['traceEvents'])} spans to {path}")
+
+
+def arm_capture():
+    """Requests a cProfile + tracemalloc capture of the next profiled block (one search, GUI thread only)."""
+    global _capture_armed
+    _capture_armed = True
+
+
+class _Capture:
+    """Runs cProfile and tracemalloc around a block and stores the report in `last_capture`."""
+    __slots__ = ("label", "profile", "started_tracemalloc")
+
+    def __init__(self, label):
+        self.label = label
+        self.profile = cProfile.Profile()
+        self.started_tracemalloc = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global last_capture
+        self.profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _current, peak = tracemalloc.get_traced_memory()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats("cumulative").print_stats(PROFILER_CONFIG['profile_top_n'])
+
+        memory_lines = [f"Peak traced memory: {peak / 1024:.1f} KiB"]
+        for stat in snapshot.statistics("lineno")[:PROFILER_CONFIG['memory_top_n']]:
+            memory_lines.append(str(stat))
+
+        last_capture = {
+            "label": f"{self.label} (GUI thread; background work: see spans)",
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "profile": stream.getvalue(),
+            "memory": "\n".join(memory_lines),
+        }
+        print(f"Captured profile for '{self.label}' (peak {peak / 1024:.1f} KiB)")
+        return False
+
+
+def profile_capture(label):
+    """
+    Returns a context manager that profiles the wrapped block if a capture was armed.
+    Costs a single flag check when no capture is requested.
+
+    cProfile only sees the calling thread: work a search hands to worker threads (background tasks such
+    as promotions, variants, nearby stores and revalidation, and the prefetch loader) is not in the
+    function profile. Those threads still record spans, which show up in the span table and the trace.
+    tracemalloc, in contrast, traces allocations of every thread.
+    """
+    global _capture_armed
+    if not (_capture_armed or _capture_always):
+        return _NULL_SPAN
+    _capture_armed = False
+    return _Capture(label)
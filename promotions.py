@@ -0,0 +1,201 @@
+import warnings
+import numpy as np
+import pandas as pd
+import profiler
+
+# Promotion Configuration - Thresholds of the price anomaly / changepoint detection
+PROMOTION_CONFIG = {
+    'window': 8,          # Previous receipts of the same (item, supermarket) forming the baseline
+    'horizon': 4,         # Following receipts used to tell a temporary promotion from a lasting price change
+    'min_history': 3,     # Receipts needed before a price can be judged
+    'z_threshold': 2.5,   # Robust z-score (median / MAD) that counts as anomalous
+    'min_change': 0.05,   # Minimum relative price change (5%)
+    'scale_floor': 0.01,  # Lower bound of the robust scale relative to the baseline (constant prices have MAD = 0)
+}
+
+# Event kinds
+PROMOTION = 'promotion'            # Temporary drop, price returns to the baseline afterwards
+PRICE_DROP = 'price_drop'          # Lasting downward level shift
+PRICE_INCREASE = 'price_increase'  # Lasting upward level shift
+
+_EVENT_DTYPES = {'id': 'int64', 'item_name_en': 'object', 'supermarket': 'object', 'day': 'int32', 'price': 'float64',
+                 'baseline': 'float64', 'z_score': 'float64', 'change_pct': 'float64', 'kind': 'object'}
+_EVENT_COLUMNS = list(_EVENT_DTYPES)
+
+
+def _window_matrix(values, groups, offsets):
+    """
+    Row i holds values[i + offset] for every offset, or NaN where that row is outside the array or belongs
+    to another group. Rows must be sorted by group, so each series is contiguous.
+    """
+    pad = int(np.max(np.abs(offsets)))
+    padded_values = np.concatenate([np.full(pad, np.nan), values, np.full(pad, np.nan)])
+    padded_groups = np.concatenate([np.full(pad, -1), groups, np.full(pad, -1)])
+    positions = np.arange(len(values))[:, None] + pad + np.asarray(offsets)[None, :]
+    matrix = padded_values[positions]
+    matrix[padded_groups[positions] != groups[:, None]] = np.nan
+    return matrix
+
+
+def _nanmedian(matrix):
+    """Row-wise nanmedian that returns NaN for empty rows without the RuntimeWarning."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmedian(matrix, axis=1)
+
+
+def detect(prices, groups):
+    """
+    Scores every receipt against the preceding receipts of its own series in one vectorized pass.
+    prices and groups are arrays sorted by (group, day). Returns a dict of per-row arrays:
+    baseline, z_score, change_pct and kind (None where nothing was detected).
+    """
+    window, horizon = PROMOTION_CONFIG['window'], PROMOTION_CONFIG['horizon']
+    threshold, min_change = PROMOTION_CONFIG['z_threshold'], PROMOTION_CONFIG['min_change']
+
+    back = _window_matrix(prices, groups, -np.arange(1, window + 1))
+    ahead = _window_matrix(prices, groups, np.arange(0, horizon))  # Includes the receipt itself
+    history = np.sum(~np.isnan(back), axis=1)
+    following = np.sum(~np.isnan(ahead[:, 1:]), axis=1)
+
+    # Robust z-score: distance from the baseline median in units of the scaled MAD
+    baseline = _nanmedian(back)
+    mad = _nanmedian(np.abs(back - baseline[:, None]))
+    scale = np.maximum(1.4826 * mad, PROMOTION_CONFIG['scale_floor'] * np.abs(baseline))
+    judged = history >= PROMOTION_CONFIG['min_history']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z_score = np.where(judged, (prices - baseline) / scale, np.nan)
+        change = np.where(judged, (prices - baseline) / baseline, np.nan)
+
+        # Changepoint: the median from this receipt on differs from the baseline (first receipt of the shift)
+        level = _nanmedian(ahead)
+        shift = (level - baseline) / baseline
+        # The receipt itself must already be anomalous in the direction of the shift
+        shifted = judged & (following >= horizon - 1) & (np.abs(level - baseline) / scale >= threshold) \
+            & (np.abs(shift) >= min_change) & (np.abs(z_score) >= threshold) & (np.abs(change) >= min_change) \
+            & (np.sign(change) == np.sign(shift))
+        # Promotion: anomalous low price that does not persist in the following receipts
+        after = _nanmedian(ahead[:, 1:])
+        recovers = (following == 0) | (after >= baseline * (1 - min_change))
+        promotion = judged & (z_score <= -threshold) & (change <= -min_change) & recovers
+
+    # Only the first receipt of a level shift is an event
+    previous_same = np.concatenate([[False], groups[1:] == groups[:-1]])
+    previous_shift = np.concatenate([[0.0], np.where(shifted, np.sign(shift), 0.0)[:-1]])
+    first_shift = shifted & ~(previous_same & (previous_shift == np.sign(shift)))
+
+    kind = np.full(len(prices), None, dtype=object)
+    kind[promotion] = PROMOTION
+    kind[first_shift & (shift < 0)] = PRICE_DROP
+    kind[first_shift & (shift > 0)] = PRICE_INCREASE
+    return {'baseline': baseline, 'z_score': z_score, 'change_pct': 100.0 * change, 'kind': kind}
+
+
+class PromotionDetector:
+    """
+    Detects promotions and lasting price changes in every (item, supermarket) price series.
+
+    The receipt history is kept sorted by (series, day, id) so every series is contiguous and all series
+    are scored together by detect(). update() merges new receipts and rescores only the tail of the
+    series they touch. Detected events are kept in a table indexed by (item_name_en, supermarket, day).
+    """
+
+    def __init__(self):
+        self._series_ids = {}              # (item_name_en, supermarket) -> series number
+        self._history = pd.DataFrame()     # id, day, price, item_name_en, supermarket, series (sorted)
+        self._events = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in _EVENT_DTYPES.items()}) \
+            .set_index(['item_name_en', 'supermarket', 'day'])
+        self._kind_by_id = pd.Series(dtype=object)
+
+    @property
+    def events(self):
+        """All detected events, indexed by (item_name_en, supermarket, day)."""
+        return self._events
+
+    @property
+    def last_day(self):
+        return int(self._history['day'].max()) if not self._history.empty else None
+
+    def fit(self, df):
+        """Scores the complete receipt history."""
+        with profiler.span("promotions.fit", rows=len(df)):
+            self.__init__()
+            self._merge(df)
+        return self
+
+    def update(self, new_rows):
+        """Merges newly arrived receipts (already known ids are ignored) and rescores the affected series tails."""
+        with profiler.span("promotions.update", rows=len(new_rows)):
+            self._merge(new_rows)
+        return self
+
+    def _series_for(self, items, supermarkets):
+        keys = pd.MultiIndex.from_arrays([items, supermarkets])
+        codes, uniques = keys.factorize()
+        ids = np.array([self._series_ids.setdefault(key, len(self._series_ids)) for key in uniques], dtype=np.int64)
+        return ids[codes]
+
+    def _merge(self, df):
+        if df.empty:
+            return
+        new = pd.DataFrame({
+            'id': df['id'].to_numpy(dtype=np.int64),
+            'day': df['day'].to_numpy(dtype=np.int32),
+            'price': df['price'].to_numpy(dtype=np.float64),
+            'item_name_en': df['item_name_en'].astype(str).to_numpy(),
+            'supermarket': df['supermarket'].astype(str).to_numpy(),
+        })
+        if not self._history.empty:
+            new = new[~new['id'].isin(self._history['id'])]
+        new = new.drop_duplicates('id')
+        if new.empty:
+            return
+        new['series'] = self._series_for(new['item_name_en'], new['supermarket'])
+        new['is_new'] = True
+
+        history = pd.concat([self._history.assign(is_new=False), new], ignore_index=True)
+        order = np.lexsort((history['id'].to_numpy(), history['day'].to_numpy(), history['series'].to_numpy()))
+        history = history.iloc[order].reset_index(drop=True)
+        series = history['series'].to_numpy()
+
+        # Position of every receipt within its series and of the first new receipt per series
+        starts = np.searchsorted(series, series, side='left')
+        rank = np.arange(len(series)) - starts
+        first_new = pd.Series(rank[history['is_new'].to_numpy()]).groupby(series[history['is_new'].to_numpy()]).min()
+        first_new_rank = first_new.reindex(series).to_numpy()  # NaN for untouched series
+
+        # Scores change from the first new receipt on and, through the look-ahead, for `horizon` receipts before it;
+        # those receipts need `window` earlier receipts as context
+        horizon, window = PROMOTION_CONFIG['horizon'], PROMOTION_CONFIG['window']
+        with np.errstate(invalid='ignore'):
+            rescored = rank >= first_new_rank - horizon
+            context = rank >= first_new_rank - horizon - window
+        subset = history[context]
+        scores = detect(subset['price'].to_numpy(), subset['series'].to_numpy())
+        keep = rescored[context]
+
+        result = subset[keep].assign(**{name: values[keep] for name, values in scores.items()})
+        found = result[result['kind'].notna()]
+
+        events = self._events.reset_index()
+        events = events[~events['id'].isin(result['id'])]
+        events = pd.concat([events, found[_EVENT_COLUMNS]], ignore_index=True).astype(_EVENT_DTYPES)
+        self._events = events.set_index(['item_name_en', 'supermarket', 'day']).sort_index()
+        self._kind_by_id = pd.Series(self._events['kind'].to_numpy(), index=self._events['id'].to_numpy())
+        self._history = history.drop(columns=['is_new'])
+
+    def for_item(self, item_name, supermarket=None):
+        """Events of one item (optionally one supermarket), ordered by supermarket and day."""
+        key, levels = ((item_name, supermarket), ['item_name_en', 'supermarket']) if supermarket else (item_name, 'item_name_en')
+        try:
+            return self._events.xs(key, level=levels, drop_level=False).reset_index()
+        except KeyError:
+            return self._events.iloc[:0].reset_index()
+
+    def kinds_for(self, df):
+        """Event kind per row of a receipts frame (None where nothing was detected), aligned with df."""
+        if df.empty:
+            return pd.Series(dtype=object)
+        kinds = pd.Series(df['id'].map(self._kind_by_id).to_numpy(), index=df.index)
+        # object dtype first: on float or string series where() would turn None back into NaN
+        return kinds.astype(object).where(kinds.notna(), None)
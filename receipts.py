@@ -0,0 +1,120 @@
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+# Compact in-memory receipt representation.
+# Receipts are converted once at load time (database._receipts_frame): repeated strings become
+# pandas categoricals, the purchase date becomes an int32 day number (days since 1970-01-01, which is
+# also Matplotlib's date epoch) and numeric columns are downcast to 32 bit. The rest of the app reads
+# these columns directly instead of re-parsing strings.
+
+# Receipt Schema - Target dtype per column of the compact frame
+RECEIPT_DTYPES = {
+    'id': 'int32',
+    'day': 'int32',
+    'weekday': 'int8',
+    'price': 'float32',
+    'weight_grams': 'float32',
+    'unit_price': 'float32',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'item_name': 'category',
+    'item_name_en': 'category',
+    'supermarket': 'category',
+    'location': 'category',
+    'brand_name': 'category',
+}
+
+EPOCH = date(1970, 1, 1)
+
+
+def compact(df):
+    """
+    Converts a receipts DataFrame (as built from the Supabase JSON) to the compact representation.
+    The string 'date' column is replaced by the int32 'day' column. Calling it on a compact frame is a no-op.
+    """
+    if df.empty or 'day' in df.columns:
+        return df
+    if 'date' in df.columns:
+        days = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+        df['day'] = days.astype(np.int32)
+        df = df.drop(columns=['date'])
+    for column, dtype in RECEIPT_DTYPES.items():
+        if column not in df.columns:
+            continue
+        if dtype == 'category':
+            df[column] = df[column].astype('category')
+        elif dtype.startswith('int'):
+            df[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype(dtype)
+        else:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(dtype)
+    return df
+
+
+def dates(df):
+    """Returns the 'day' column as a DatetimeIndex (vectorized, no string parsing)."""
+    return pd.DatetimeIndex(df['day'].to_numpy().astype('datetime64[D]'))
+
+
+def day_strings(df):
+    """Returns the 'day' column formatted as ISO date strings (YYYY-MM-DD) for display."""
+    return np.datetime_as_string(df['day'].to_numpy().astype('datetime64[D]'), unit='D')
+
+
+def day_number(value):
+    """Converts a date / datetime / ISO string to the int32 day number used in the 'day' column."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    if hasattr(value, 'date'):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def day_to_date(day):
+    return EPOCH + timedelta(days=int(day))
+
+
+def bytes_per_receipt(df):
+    """Deep memory usage of the frame divided by its row count."""
+    if df.empty:
+        return 0.0
+    return df.memory_usage(deep=True).sum() / len(df)
+
+
+class Receipt:
+    """Lightweight row object for code that needs one object per receipt (table filling, map markers)."""
+    __slots__ = ('id', 'day', 'price', 'weight_grams', 'unit_price', 'item_name_en',
+                 'supermarket', 'location', 'brand_name')
+
+    def __init__(self, id, day, price, weight_grams, unit_price, item_name_en, supermarket, location, brand_name):
+        self.id = id
+        self.day = day
+        self.price = price
+        self.weight_grams = weight_grams
+        self.unit_price = unit_price
+        self.item_name_en = item_name_en
+        self.supermarket = supermarket
+        self.location = location
+        self.brand_name = brand_name
+
+    @property
+    def date(self):
+        return day_to_date(self.day)
+
+
+def _column_values(df, column):
+    """Per-row accessor for a column; categoricals are looked up through their codes without materializing strings."""
+    if column not in df.columns:
+        return [None] * len(df)
+    series = df[column]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories.to_numpy()
+        codes = series.cat.codes.to_numpy()
+        return [categories[code] if code >= 0 else None for code in codes]
+    return series.to_numpy().tolist()
+
+
+def records(df):
+    """Returns the frame's rows as a list of Receipt objects, in frame order."""
+    columns = [_column_values(df, column) for column in Receipt.__slots__]
+    return [Receipt(*values) for values in zip(*columns)]
@@ -0,0 +1,270 @@
+import argparse
+import hashlib
+import html
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import matplotlib
+matplotlib.use("Agg") # Headless: never touch Qt / QtWebEngine
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+import matplotlib.font_manager as fm
+import matplotlib.image as mpimg
+import cities
+import ml_model
+from chart_render import CHART_STYLE, draw_price_history
+from static_map import render_static_map
+
+# Report Configuration - Centralized settings for the "newspaper edition"
+REPORT_CONFIG = {
+    'min_receipts': 3,        # Same threshold as the product dropdown
+    'chunk_size': 8,          # Items per worker task
+    'dpi': 100,
+    'chart_size': (8, 3),     # Inches
+    'map_size': (6, 3.5),
+    'outlook_horizon': 30,    # Days covered by the seasonal outlook line of every article
+}
+
+
+def _init_worker(city):
+    """Worker initializer: fonts and the edition's city (tile cache and holidays are per city)."""
+    _register_fonts()
+    cities.set_city(city)
+
+
+def _register_fonts():
+    """Registers the bundled fonts with Matplotlib so CHART_STYLE['font_family'] resolves in every process."""
+    font_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "fonts"))
+    for f in os.listdir(font_dir):
+        if f.endswith('.ttf'):
+            try:
+                fm.fontManager.addfont(os.path.join(font_dir, f))
+            except Exception as e:
+                print(f"Could not register font {f} with Matplotlib: {e}")
+
+
+def _slug(name):
+    """File name stem of an item: readable ASCII plus a short hash, so names that differ only in punctuation never collide."""
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    readable = re.sub(r"[^a-z0-9]+", "-", ascii_name.lower()).strip("-") or "item"
+    return f"{readable}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _new_figure(size):
+    figure = Figure(figsize=size, dpi=REPORT_CONFIG['dpi'], facecolor=CHART_STYLE['background_color'])
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _render_chunk(out_dir, chunk):
+    """
+    Worker task: renders chart and map PNGs plus the recommendation for a chunk of (item_name, df) pairs.
+    Figures are created once per chunk and redrawn for every item.
+    """
+    started = time.perf_counter()
+    chart_figure = _new_figure(REPORT_CONFIG['chart_size'])
+    map_figure = _new_figure(REPORT_CONFIG['map_size'])
+    entries = []
+    for item_name, df in chunk:
+        slug = _slug(item_name)
+        chart_file = f"{slug}_chart.png"
+        map_file = f"{slug}_map.png"
+
+        draw_price_history(chart_figure, df.copy())
+        chart_figure.savefig(os.path.join(out_dir, chart_file), facecolor=CHART_STYLE['background_color'])
+
+        # Coordinates are resolved once in the parent, so workers never call the geocoding API
+        stores = df.dropna(subset=['lat', 'lng']).drop_duplicates(['lat', 'lng'])
+        render_static_map(map_figure, list(zip(stores['lat'], stores['lng'])))
+        map_figure.savefig(os.path.join(out_dir, map_file), facecolor=CHART_STYLE['background_color'])
+
+        result = ml_model.get_recommendation(df.copy())
+        entries.append({
+            'item': item_name,
+            'records': len(df),
+            'supermarkets': sorted(df['supermarket'].dropna().unique().tolist()),
+            'last_price': float(df.sort_values('day')['price'].iloc[-1]),
+            'recommendation': result['recommendation'],
+            'chart': chart_file,
+            'map': map_file,
+        })
+    return entries, os.getpid(), time.perf_counter() - started
+
+
+def _load_receipts(items=None):
+    """Fetches receipts once in the parent and attaches store coordinates (stored lat/lng, else geocoded)."""
+    import database
+    import geocoding
+    df = database.get_receipts_for_items(items) if items else database.get_all_receipts()
+    if df.empty:
+        return df
+
+    coords = {}
+    for supermarket, location, lat, lng in df[['supermarket', 'location', 'latitude', 'longitude']].itertuples(index=False):
+        key = (supermarket, location)
+        if key in coords:
+            continue
+        if lat == lat and lng == lng and lat is not None and lng is not None:
+            coords[key] = (float(lat), float(lng))
+        else:
+            coords[key] = geocoding.geocode_location(supermarket, location)
+    keys = list(zip(df['supermarket'], df['location']))
+    df['lat'] = [coords[key][0] for key in keys]
+    df['lng'] = [coords[key][1] for key in keys]
+    return df
+
+
+def write_html(out_dir, entries, edition_date):
+    """Writes index.html in the vintage newspaper look of the app."""
+    articles = []
+    for entry in entries:
+        recommendation = html.escape(entry['recommendation']).replace("\n", "<br>")
+        articles.append(f"""
+        <article>
+            <h2>{html.escape(entry['item'])}</h2>
+            <p class="meta">REC: {entry['records']} &middot; {html.escape(', '.join(entry['supermarkets']))}
+               &middot; Last price {entry['last_price']:.2f} €</p>
+            <p class="verdict">{recommendation}</p>
+            <p class="meta">{REPORT_CONFIG['outlook_horizon']}-day outlook: {html.escape(entry.get('outlook') or '-')}</p>
+            <img src="{entry['chart']}" alt="Price history of {html.escape(entry['item'])}">
+            <img src="{entry['map']}" alt="Stores selling {html.escape(entry['item'])}">
+        </article>""")
+
+    page = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>The Dönerprice - {edition_date}</title>
+<style>
+    body {{ background: {CHART_STYLE['background_color']}; color: {CHART_STYLE['ink_color']};
+            font-family: "Noto Serif", serif; max-width: 1000px; margin: 0 auto; padding: 20px; }}
+    header {{ border-bottom: 4px double {CHART_STYLE['ink_color']}; text-align: center; }}
+    header h1 {{ font-size: 68px; font-weight: 900; text-transform: uppercase; letter-spacing: -2px; margin: 10px 0; }}
+    .sub {{ border-top: 2px solid; border-bottom: 2px solid; padding: 5px 0; text-transform: uppercase;
+            font-weight: bold; font-size: 12px; display: flex; justify-content: space-between; }}
+    article {{ border: 2px solid; padding: 15px; margin: 20px 0; }}
+    article h2 {{ text-transform: uppercase; border-bottom: 2px solid; margin-top: 0; }}
+    .meta {{ font-family: "Courier Prime", monospace; font-size: 12px; }}
+    .verdict {{ font-style: italic; }}
+    img {{ max-width: 100%; display: block; margin: 10px auto; }}
+</style>
+</head>
+<body>
+<header>
+    <h1>The Dönerprice</h1>
+    <div class="sub"><span>Grocery Intelligence</span><span>{edition_date}</span><span>{html.escape(cities.city_config()['edition'])} &middot; {len(entries)} Items</span></div>
+</header>
+{''.join(articles)}
+</body>
+</html>
+"""
+    path = os.path.join(out_dir, "index.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(page)
+    return path
+
+
+def write_pdf(out_dir, entries, edition_date):
+    """Writes edition.pdf with one page per item (chart above map)."""
+    path = os.path.join(out_dir, "edition.pdf")
+    with PdfPages(path) as pdf:
+        for entry in entries:
+            figure = Figure(figsize=(8.27, 11.69), facecolor=CHART_STYLE['background_color']) # A4
+            FigureCanvasAgg(figure)
+            figure.suptitle(entry['item'], fontfamily=CHART_STYLE['font_family'], fontsize=20, fontweight='bold')
+            figure.text(0.5, 0.92, f"{edition_date}  |  REC: {entry['records']}  |  "
+                        + entry['recommendation'].replace("\n", "  |  "),
+                        ha='center', fontsize=8, fontfamily=CHART_STYLE['font_family'])
+            for position, image in (([0.05, 0.55, 0.9, 0.33], entry['chart']), ([0.05, 0.08, 0.9, 0.42], entry['map'])):
+                ax = figure.add_axes(position)
+                ax.imshow(mpimg.imread(os.path.join(out_dir, image)))
+                ax.set_axis_off()
+            pdf.savefig(figure, facecolor=CHART_STYLE['background_color'])
+    return path
+
+
+def render_edition(out_dir, items=None, workers=None, pdf=False):
+    """
+    Renders a static edition (PNG charts/maps, index.html and optionally edition.pdf) for all items with
+    at least REPORT_CONFIG['min_receipts'] receipts, fanning item chunks out over a process pool.
+    Returns a dict with throughput statistics.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    _register_fonts()
+    started = time.perf_counter()
+    df = _load_receipts(items)
+    if df.empty:
+        print("No receipts found - nothing to render.")
+        return {"items": 0}
+    loaded = time.perf_counter()
+
+    counts = df['item_name_en'].value_counts()
+    selected = sorted(counts[counts >= REPORT_CONFIG['min_receipts']].index)
+    groups = dict(tuple(df[df['item_name_en'].isin(selected)].groupby('item_name_en', observed=True)))
+    pairs = [(name, groups[name].reset_index(drop=True)) for name in selected]
+    size = REPORT_CONFIG['chunk_size']
+    chunks = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+
+    entries = []
+    worker_seconds = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cities.current_city(),)) as pool:
+        futures = [pool.submit(_render_chunk, out_dir, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            chunk_entries, pid, seconds = future.result()
+            entries.extend(chunk_entries)
+            worker_seconds[pid] = worker_seconds.get(pid, 0.0) + seconds
+            print(f"Rendered {len(entries)}/{len(pairs)} items")
+    rendered = time.perf_counter()
+
+    entries.sort(key=lambda e: e['item'])
+    # One batched seasonal forecast for all items instead of a model run per worker item
+    outlooks = ml_model.get_seasonal_forecasts(dict(pairs), REPORT_CONFIG['outlook_horizon'])
+    for entry in entries:
+        outlook = outlooks[entry['item']]
+        entry['outlook'] = outlook['recommendation'].replace("\n", " · ") if 'predictions' in outlook else ""
+    edition_date = datetime.now().strftime("%A, %B %d, %Y")
+    outputs = [write_html(out_dir, entries, edition_date)]
+    if pdf:
+        outputs.append(write_pdf(out_dir, entries, edition_date))
+    finished = time.perf_counter()
+
+    render_time = rendered - loaded
+    stats = {
+        "items": len(entries),
+        "chunks": len(chunks),
+        "workers": len(worker_seconds),
+        "load_seconds": loaded - started,
+        "render_seconds": render_time,
+        "write_seconds": finished - rendered,
+        "total_seconds": finished - started,
+        "items_per_second": len(entries) / render_time if render_time > 0 else 0.0,
+        "outputs": outputs,
+    }
+    print(f"Edition: {stats['items']} items in {stats['total_seconds']:.1f}s "
+          f"(load {stats['load_seconds']:.1f}s, render {render_time:.1f}s on {stats['workers']} workers, "
+          f"{stats['items_per_second']:.1f} items/s, write {stats['write_seconds']:.1f}s)")
+    for path in outputs:
+        print(f"Wrote {path}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a static Dönerprice edition without the GUI.")
+    parser.add_argument("--out", default=None, help="Output directory (default: editions/<city>/<today>)")
+    parser.add_argument("--items", nargs="*", help="Only render these items (default: all items)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--pdf", action="store_true", help="Also write edition.pdf")
+    parser.add_argument("--city", default=cities.DEFAULT_CITY, choices=sorted(cities.CITY_CONFIG),
+                        help="City edition to render (default: DONERPRICER_CITY or muenster)")
+    args = parser.parse_args()
+    cities.set_city(args.city)
+    out_dir = args.out or os.path.join("editions", args.city, datetime.now().strftime("%Y-%m-%d"))
+    render_edition(out_dir, items=args.items, workers=args.workers, pdf=args.pdf)
+
+
+if __name__ == "__main__":
+    main()
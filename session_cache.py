@@ -0,0 +1,159 @@
+import os
+import pickle
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import sklearn
+import cities
+import profiler
+import receipts
+from basket import BasketEngine, DEFAULT_BASKET
+from promotions import PromotionDetector, PROMOTION_CONFIG
+from store_compare import StoreComparison, COMPARE_CONFIG
+
+# Session cache: the state of the last run (catalog, recent searches with their results and map payloads,
+# fitted models, geocoded coordinates) pickled to disk, so the next launch can show it before any query
+# returns. No Qt imports here; main.py decides what to restore and revalidates it in the background.
+
+# Session Configuration - Location, versioning and size of the on-disk cache
+SESSION_CONFIG = {
+    'directory': os.path.join(os.path.dirname(os.path.abspath(__file__)), "session_cache"),  # <city>.pkl per edition
+    'schema_version': 2,   # Bump whenever the layout of the cached state changes
+    'max_searches': 5,     # Most recent searches kept with their frames and results
+    'max_age_days': 30,    # Older caches are discarded instead of shown
+}
+
+# Fitted models that may be cached, by the MainWindow attribute they are restored to
+MODEL_TYPES = {
+    'basket_engine': BasketEngine,
+    'promotion_detector': PromotionDetector,
+    'store_comparison': StoreComparison,
+}
+
+# Columns every cached receipts frame needs to be rendered
+_REQUIRED_COLUMNS = ['id', 'day', 'price', 'item_name_en', 'supermarket', 'location']
+
+
+def _library_versions():
+    """Pickled frames and models are only portable between identical library versions."""
+    return {'pandas': pd.__version__, 'numpy': np.__version__, 'sklearn': sklearn.__version__}
+
+
+def _model_fingerprint():
+    """Configuration the cached models were fitted with; a changed threshold invalidates them."""
+    return repr((sorted(PROMOTION_CONFIG.items()), sorted(COMPARE_CONFIG.items()), sorted(DEFAULT_BASKET.items())))
+
+
+def valid_frame(df):
+    """True if df has the compact receipts schema (see receipts.RECEIPT_DTYPES) or is empty."""
+    if not isinstance(df, pd.DataFrame):
+        return False
+    if df.empty:
+        return True
+    if any(column not in df.columns for column in _REQUIRED_COLUMNS):
+        return False
+    return all(str(df[column].dtype) == dtype for column, dtype in receipts.RECEIPT_DTYPES.items() if column in df.columns)
+
+
+def frame_fingerprint(df):
+    """Cheap identity of a receipts frame, used to tell whether a revalidated search returned new data."""
+    if df.empty:
+        return (0,)
+    return (len(df), int(df['id'].astype(np.int64).sum()), int(df['day'].max()), round(float(df['price'].astype(np.float64).sum()), 4))
+
+
+class SessionCache:
+    """
+    Versioned on-disk snapshot of the previous session.
+
+    Holds the item counts of the catalog, the last SESSION_CONFIG['max_searches'] searches (frame, model
+    result, promotion flags, map payload and variant summary), fitted models and the geocode cache.
+    load() checks the schema version, the age, the library versions and the model configuration and drops
+    whatever does not pass instead of failing; save() writes atomically, so a crash never leaves a torn file.
+    """
+
+    def __init__(self, path=None, city=None):
+        self.path = path or os.path.join(SESSION_CONFIG['directory'], f"{city or cities.current_city()}.pkl")
+        self.item_counts = None              # Counter of receipts per item name
+        self.searches = OrderedDict()        # (item, supermarket, forecast_mode, horizon) -> entry, oldest first
+        self.models = {}                     # MODEL_TYPES key -> fitted model
+        self.geocodes = {}                   # geocoding.resolved_coords(): successful lookups only
+        self.saved_at = None
+
+    @property
+    def last_search(self):
+        """Most recent search entry, or None."""
+        return next(reversed(self.searches.values()), None)
+
+    def load(self):
+        """Reads the cache file; missing, outdated or unreadable parts are discarded. Returns self."""
+        if not os.path.exists(self.path):
+            return self
+        with profiler.span("session.load"):
+            try:
+                with open(self.path, "rb") as f:
+                    state = pickle.load(f)
+            except Exception as e:
+                print(f"Discarding unreadable session cache: {e}")
+                return self
+            if not isinstance(state, dict) or state.get('schema_version') != SESSION_CONFIG['schema_version']:
+                print("Discarding session cache with an outdated schema")
+                return self
+            if time.time() - state.get('saved_at', 0) > SESSION_CONFIG['max_age_days'] * 86400:
+                print("Discarding expired session cache")
+                return self
+
+            # Plain Python state survives library upgrades
+            self.saved_at = state['saved_at']
+            self.item_counts = state.get('item_counts')
+            self.geocodes = state.get('geocodes', {})
+            if state.get('libraries') != _library_versions():
+                print("Library versions changed, session cache frames and models are discarded")
+                return self
+
+            for key, entry in state.get('searches', []):
+                if valid_frame(entry.get('df')):
+                    self.searches[key] = entry
+            if state.get('model_fingerprint') == _model_fingerprint():
+                self.models = {name: model for name, model in state.get('models', {}).items()
+                               if isinstance(model, MODEL_TYPES.get(name, ()))}
+        print(f"Session cache: {len(self.searches)} searches, {len(self.models)} models")
+        return self
+
+    def save(self):
+        """Writes the cache through a temporary file and an atomic rename."""
+        state = {
+            'schema_version': SESSION_CONFIG['schema_version'],
+            'saved_at': time.time(),
+            'libraries': _library_versions(),
+            'model_fingerprint': _model_fingerprint(),
+            'item_counts': self.item_counts,
+            'searches': list(self.searches.items()),
+            'models': {name: model for name, model in self.models.items() if model is not None},
+            'geocodes': dict(self.geocodes),
+        }
+        with profiler.span("session.save", searches=len(self.searches)):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary = f"{self.path}.tmp"
+            try:
+                with open(temporary, "wb") as f:
+                    pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporary, self.path)
+            except Exception as e:
+                print(f"Could not write session cache: {e}")
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+
+    def search(self, item_name, supermarket, forecast_mode, horizon):
+        """Cached entry of a search, or None."""
+        return self.searches.get((item_name, supermarket, forecast_mode, horizon))
+
+    def remember_search(self, item_name, supermarket, forecast_mode, horizon, **entry):
+        """Stores a search as the most recent one (entry: df, result, promotions, map_payload, variants, supermarkets)."""
+        key = (item_name, supermarket, forecast_mode, horizon)
+        self.searches.pop(key, None)
+        self.searches[key] = dict(entry, item_name=item_name, supermarket=supermarket,
+                                  forecast_mode=forecast_mode, horizon=horizon)
+        while len(self.searches) > SESSION_CONFIG['max_searches']:
+            self.searches.popitem(last=False)
@@ -0,0 +1,137 @@
+import io
+import math
+import os
+import numpy as np
+import requests
+import matplotlib.image as mpimg
+import matplotlib.colors as mcolors
+from chart_render import CHART_STYLE
+import cities
+
+# Static map rendering for headless reports: OSM tiles from a disk cache, composed with numpy and drawn
+# with matplotlib, in the same monochrome/sepia look as the Leaflet map in map.py (no QtWebEngine needed).
+
+# Tile Configuration - Centralized settings for the tile cache
+TILE_CONFIG = {
+    'cache_dir': os.path.join(os.path.dirname(os.path.abspath(__file__)), "tile_cache"),  # One subdirectory per city
+    'url': "https://tile.openstreetmap.org/{z}/{x}/{y}.png",
+    'user_agent': 'Donerpricer/1.0 (Educational Project)',
+    'tile_size': 256,
+    'min_zoom': 10,
+    'max_zoom': 16,
+    'padding_tiles': 1,
+    # With DONERPRICER_TILES_OFFLINE=1 only cached tiles are used; missing ones are left blank
+    'offline': os.environ.get("DONERPRICER_TILES_OFFLINE", "0") == "1",
+}
+
+
+def lat_lon_to_tile(lat, lon, zoom):
+    """Converts WGS84 coordinates to fractional slippy-map tile coordinates (x, y) at zoom."""
+    n = 2 ** zoom
+    x = (lon + 180.0) / 360.0 * n
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def tile_path(zoom, x, y, city=None):
+    return os.path.join(TILE_CONFIG['cache_dir'], city or cities.current_city(), str(zoom), str(x), f"{y}.png")
+
+
+def _as_rgb(image):
+    """Normalizes grayscale / RGBA tiles to an RGB float array."""
+    if image.ndim == 2:
+        image = np.stack([image] * 3, axis=-1)
+    image = image[..., :3]
+    return image / 255.0 if image.dtype == np.uint8 else image
+
+
+def get_tile(zoom, x, y):
+    """Returns the tile as an RGB float array, reading the disk cache first and downloading on a miss."""
+    path = tile_path(zoom, x, y)
+    if os.path.exists(path):
+        return _as_rgb(mpimg.imread(path))
+    if TILE_CONFIG['offline']:
+        return None
+    try:
+        response = requests.get(TILE_CONFIG['url'].format(z=zoom, x=x, y=y),
+                                headers={'User-Agent': TILE_CONFIG['user_agent']}, timeout=10)
+        if response.status_code != 200:
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so parallel workers never read a half-written tile
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp_path, path)
+        return _as_rgb(mpimg.imread(io.BytesIO(response.content), format="png"))
+    except Exception as e:
+        print(f"Tile error for {zoom}/{x}/{y}: {e}")
+        return None
+
+
+def _choose_zoom(lats, lons, max_tiles=3):
+    """Highest zoom at which all points fit into max_tiles x max_tiles tiles."""
+    for zoom in range(TILE_CONFIG['max_zoom'], TILE_CONFIG['min_zoom'] - 1, -1):
+        x0, y0 = lat_lon_to_tile(max(lats), min(lons), zoom)
+        x1, y1 = lat_lon_to_tile(min(lats), max(lons), zoom)
+        if x1 - x0 <= max_tiles - 1 and y1 - y0 <= max_tiles - 1:
+            return zoom
+    return TILE_CONFIG['min_zoom']
+
+
+def _vintage_filter(image):
+    """Numpy version of the Leaflet CSS filter: grayscale(100%) contrast(1.2) brightness(1.05) sepia(0.2)."""
+    gray = image @ np.array([0.299, 0.587, 0.114])
+    gray = np.clip(((gray - 0.5) * 1.2 + 0.5) * 1.05, 0, 1)
+    sepia = gray[..., None] * np.array([1.0, 0.89, 0.70])
+    return np.clip(0.8 * gray[..., None] + 0.2 * sepia, 0, 1)
+
+
+def render_static_map(figure, points, zoom=None):
+    """
+    Draws a static map with one € marker per (lat, lon) point onto figure.
+    Returns the axes; an empty point list draws a placeholder text instead.
+    """
+    figure.clear()
+    figure.set_facecolor(CHART_STYLE['background_color'])
+    ax = figure.add_axes([0, 0, 1, 1])
+    ax.set_axis_off()
+    if not points:
+        ax.text(0.5, 0.5, "No locations on record", ha='center', va='center',
+                fontfamily='serif', fontstyle='italic', color=CHART_STYLE['grey_color'])
+        return ax
+
+    lats = [lat for lat, _lon in points]
+    lons = [lon for _lat, lon in points]
+    zoom = zoom or _choose_zoom(lats, lons)
+    size = TILE_CONFIG['tile_size']
+    pad = TILE_CONFIG['padding_tiles']
+
+    x_min, y_min = lat_lon_to_tile(max(lats), min(lons), zoom)
+    x_max, y_max = lat_lon_to_tile(min(lats), max(lons), zoom)
+    tx0, ty0 = int(x_min) - pad, int(y_min) - pad
+    tx1, ty1 = int(x_max) + pad, int(y_max) + pad
+
+    # Paper-colored canvas; missing tiles simply stay blank
+    mosaic = np.empty(((ty1 - ty0 + 1) * size, (tx1 - tx0 + 1) * size, 3))
+    mosaic[:] = mcolors.to_rgb(CHART_STYLE['background_color'])
+    for tx in range(tx0, tx1 + 1):
+        for ty in range(ty0, ty1 + 1):
+            tile = get_tile(zoom, tx % (2 ** zoom), ty)
+            if tile is not None:
+                row, col = (ty - ty0) * size, (tx - tx0) * size
+                mosaic[row:row + size, col:col + size] = tile[:size, :size]
+
+    ax.imshow(_vintage_filter(mosaic), extent=(tx0, tx1 + 1, ty1 + 1, ty0), interpolation='bilinear')
+    for lat, lon in points:
+        x, y = lat_lon_to_tile(lat, lon, zoom)
+        ax.plot(x, y, marker='o', markersize=14, color=CHART_STYLE['ink_color'],
+                markeredgecolor='white', markeredgewidth=1)
+        ax.text(x, y, "€", ha='center', va='center', fontsize=7, fontweight='bold',
+                color=CHART_STYLE['background_color'])
+
+    # Crop to the points plus a margin of half a tile
+    ax.set_xlim(x_min - 0.5, x_max + 0.5)
+    ax.set_ylim(y_max + 0.5, y_min - 0.5)
+    return ax
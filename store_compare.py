@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+import profiler
+
+# Store comparison: an item x store matrix of the latest known prices plus a spatial index over the
+# store coordinates, answering "cheapest store(s) within N km for this list" without touching receipts.
+
+# Comparison Configuration - Search radius and result sizes
+COMPARE_CONFIG = {
+    'radius_km': 2.0,       # Default search radius
+    'radius_choices': [1.0, 2.0, 5.0, 10.0],
+    'max_stores': 5,        # Ranked stores returned per query
+}
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class StoreComparison:
+    """
+    Latest price of every item at every store (supermarket + location) as a dense float matrix, with a
+    BallTree (haversine metric) over the store coordinates.
+
+    A query only selects the stores inside the radius from the tree and the list's rows from the matrix,
+    so it runs in milliseconds regardless of the receipt history size. Store coordinates come from the
+    stored latitude/longitude; stores without them are geocoded through `locate` (stores that cannot be
+    located are left out of the spatial index).
+    """
+
+    def __init__(self, locate=None):
+        self.locate = locate              # (supermarket, location) -> (lat, lng) or None
+        self._latest = pd.DataFrame()     # Last receipt per (item, supermarket, location)
+        self._coords = {}                 # (supermarket, location) -> (lat, lng), None if it cannot be located
+        self.items = []
+        self.stores = pd.DataFrame(columns=['supermarket', 'location', 'lat', 'lng'])
+        self.prices = np.empty((0, 0), dtype=np.float32)
+        self.price_days = np.empty((0, 0), dtype=np.int32)
+        self._item_rows = {}
+        self._tree = None
+
+    @property
+    def last_day(self):
+        return int(self._latest['day'].max()) if not self._latest.empty else None
+
+    def fit(self, df):
+        """Builds the matrix and spatial index from the complete receipt history."""
+        with profiler.span("compare.fit", rows=len(df)):
+            self.__init__(self.locate)
+            self._merge(df)
+        return self
+
+    def update(self, new_rows):
+        """Merges new receipts; the spatial index is only rebuilt when a new store appears."""
+        with profiler.span("compare.update", rows=len(new_rows)):
+            self._merge(new_rows)
+        return self
+
+    def _merge(self, df):
+        if df.empty:
+            return
+        rows = pd.DataFrame({
+            'id': df['id'].to_numpy(dtype=np.int64),
+            'day': df['day'].to_numpy(dtype=np.int32),
+            'price': df['price'].to_numpy(dtype=np.float32),
+            'item_name_en': df['item_name_en'].astype(str).to_numpy(),
+            'supermarket': df['supermarket'].astype(str).to_numpy(),
+            'location': df['location'].astype(str).to_numpy(),
+            'latitude': df['latitude'].to_numpy(dtype=np.float64) if 'latitude' in df.columns else np.nan,
+            'longitude': df['longitude'].to_numpy(dtype=np.float64) if 'longitude' in df.columns else np.nan,
+        })
+        if not self._latest.empty:
+            # Receipts merged before (e.g. the rows of a repeated search) change nothing
+            rows = rows[~rows['id'].isin(self._latest['id'])]
+            if rows.empty:
+                return
+        # Latest receipt per (item, store): last by (day, id)
+        rows = rows.sort_values(['day', 'id']).drop_duplicates(['item_name_en', 'supermarket', 'location'], keep='last')
+        self._latest = pd.concat([self._latest, rows], ignore_index=True).sort_values(['day', 'id']) \
+            .drop_duplicates(['item_name_en', 'supermarket', 'location'], keep='last').reset_index(drop=True)
+        rows = rows[rows['id'].isin(self._latest['id'])]
+        if rows.empty:
+            return
+
+        # Stores that were already found to have no coordinates stay out of the matrix
+        keys = list(zip(rows['supermarket'], rows['location']))
+        routable = np.array([key not in self._coords or self._coords[key] is not None for key in keys], dtype=bool)
+        rows = rows[routable]
+        columns = self._store_columns()
+        store_column = np.array([columns.get(key, -1) for key, ok in zip(keys, routable) if ok], dtype=np.int64)
+        item_row = rows['item_name_en'].map(self._item_rows)
+        if self._tree is not None and item_row.notna().all() and (store_column >= 0).all():
+            # Known items at known stores: overwrite the matrix cells in place, no rebuild
+            r, c = item_row.to_numpy(dtype=np.int64), store_column
+            newer = np.isnan(self.prices[r, c]) | (rows['day'].to_numpy() >= self.price_days[r, c])
+            self.prices[r[newer], c[newer]] = rows['price'].to_numpy()[newer]
+            self.price_days[r[newer], c[newer]] = rows['day'].to_numpy()[newer]
+            return
+        self._build()
+
+    def _store_columns(self):
+        return {key: j for j, key in enumerate(zip(self.stores['supermarket'], self.stores['location']))}
+
+    def _store_coords(self, stores):
+        """Mean stored coordinates per store, geocoded through `locate` where none are stored."""
+        stored = self._latest.dropna(subset=['latitude', 'longitude']) \
+            .groupby(['supermarket', 'location'])[['latitude', 'longitude']].mean()
+        for key in stores:
+            if key in self._coords:
+                continue
+            if key in stored.index:
+                self._coords[key] = tuple(stored.loc[key])
+            elif self.locate is not None:
+                self._coords[key] = self.locate(*key)
+            else:
+                self._coords[key] = None
+
+    def _build(self):
+        latest = self._latest
+        store_keys = list(latest.groupby(['supermarket', 'location'], sort=True).groups)
+        self._store_coords(store_keys)
+        # Stores without coordinates cannot be routed to
+        store_keys = [key for key in store_keys if self._coords.get(key)]
+        previous = list(zip(self.stores['supermarket'], self.stores['location']))
+
+        self.items = sorted(latest['item_name_en'].unique())
+        self._item_rows = {item: i for i, item in enumerate(self.items)}
+        store_columns = {key: j for j, key in enumerate(store_keys)}
+        keys = list(zip(latest['supermarket'], latest['location']))
+        known = np.array([key in store_columns for key in keys], dtype=bool)
+        row = latest['item_name_en'].map(self._item_rows).to_numpy()[known]
+        column = np.array([store_columns[key] for key, ok in zip(keys, known) if ok], dtype=np.int64)
+
+        self.prices = np.full((len(self.items), len(store_keys)), np.nan, dtype=np.float32)
+        self.price_days = np.zeros((len(self.items), len(store_keys)), dtype=np.int32)
+        self.prices[row, column] = latest['price'].to_numpy()[known]
+        self.price_days[row, column] = latest['day'].to_numpy()[known]
+
+        if store_keys != previous or self._tree is None:
+            coords = np.array([self._coords[key] for key in store_keys], dtype=np.float64).reshape(-1, 2)
+            self.stores = pd.DataFrame({
+                'supermarket': [key[0] for key in store_keys],
+                'location': [key[1] for key in store_keys],
+                'lat': coords[:, 0],
+                'lng': coords[:, 1],
+            })
+            self._tree = BallTree(np.radians(coords), metric='haversine') if len(coords) else None
+
+    def stores_within(self, lat, lng, radius_km):
+        """Indices (into self.stores) and distances in km of the stores within radius_km, nearest first."""
+        if self._tree is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        indices, distances = self._tree.query_radius(np.radians([[lat, lng]]), r=radius_km / EARTH_RADIUS_KM,
+                                                     return_distance=True, sort_results=True)
+        return indices[0], distances[0] * EARTH_RADIUS_KM
+
+    def cheapest(self, items, lat, lng, radius_km=None, quantities=None, limit=None):
+        """
+        Cheapest stores for a shopping list within radius_km of (lat, lng).
+        Returns a dict with
+          'stores':  stores in range ranked by basket cost (complete lists first), then distance,
+          'split':   the cheapest store per item when shopping at several stores,
+          'split_cost', 'missing' (items without any price in range), 'center' and 'radius_km'.
+        """
+        radius_km = radius_km or COMPARE_CONFIG['radius_km']
+        limit = limit or COMPARE_CONFIG['max_stores']
+        with profiler.span("compare.query", items=len(items), radius_km=radius_km):
+            known = [item for item in items if item in self._item_rows]
+            candidates, distances = self.stores_within(lat, lng, radius_km)
+            if len(candidates) == 0 or not known:
+                return {'stores': self.stores.iloc[:0], 'split': pd.DataFrame(columns=['item', 'price']),
+                        'split_cost': 0.0, 'missing': list(items), 'center': (lat, lng), 'radius_km': radius_km}
+            weights = np.array([(quantities or {}).get(item, 1.0) for item in known], dtype=np.float64)
+            prices = self.prices[np.ix_([self._item_rows[item] for item in known], candidates)].astype(np.float64)
+            available = ~np.isnan(prices)
+
+            # One store for the whole list: weighted sum of the available items
+            costs = np.nansum(prices * weights[:, None], axis=0)
+            counts = available.sum(axis=0)
+            ranking = pd.DataFrame({
+                'store': candidates,
+                'distance_km': distances,
+                'basket_cost': costs,
+                'items_available': counts,
+            })
+            ranking = ranking[ranking['items_available'] > 0]
+            ranking = ranking.sort_values(['items_available', 'basket_cost', 'distance_km'],
+                                          ascending=[False, True, True]).head(limit)
+            ranking = self.stores.iloc[ranking['store']].reset_index(drop=True).join(
+                ranking.drop(columns='store').reset_index(drop=True))
+            ranking['complete'] = ranking['items_available'] == len(items)
+
+            # Several stores: the cheapest store in range per item
+            has_price = available.any(axis=1)
+            best = np.where(has_price, np.argmin(np.where(available, prices, np.inf), axis=1), -1)
+            split = pd.DataFrame({
+                'item': [item for item, ok in zip(known, has_price) if ok],
+                'price': prices[has_price, best[has_price]],
+                'distance_km': distances[best[has_price]],
+            })
+            if len(split):
+                split = split.join(self.stores.iloc[candidates[best[has_price]]].reset_index(drop=True))
+            missing = [item for item in items if item not in set(split['item'])]
+            split_cost = float((split['price'] * split['item'].map(lambda item: (quantities or {}).get(item, 1.0))).sum()) \
+                if len(split) else 0.0
+
+        return {
+            'stores': ranking,
+            'split': split,
+            'split_cost': split_cost,
+            'missing': missing,
+            'center': (lat, lng),
+            'radius_km': radius_km,
+        }
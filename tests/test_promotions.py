@@ -0,0 +1,38 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import receipts
+from promotions import PromotionDetector, PROMOTION
+
+
+def _receipts(prices, item_name="EGGS M-L", first_id=0):
+    return receipts.compact(pd.DataFrame({
+        'id': range(first_id, first_id + len(prices)),
+        'date': pd.date_range("2024-01-01", periods=len(prices), freq="7D").strftime("%Y-%m-%d"),
+        'price': prices,
+        'item_name_en': item_name,
+        'supermarket': "REWE",
+        'location': "Hafen",
+    }))
+
+
+def test_kinds_for_without_events_is_none():
+    df = _receipts([1.99] * 12)
+    kinds = PromotionDetector().fit(df).kinds_for(df)
+    assert len(kinds) == len(df)
+    assert all(kind is None for kind in kinds)
+
+
+def test_kinds_for_mixed_events_keeps_none_for_other_rows():
+    prices = [1.99] * 10 + [0.99] + [1.99] * 6
+    eggs = _receipts(prices)
+    flat = _receipts([2.49] * len(prices), item_name="GOUDA CHEESE 48%", first_id=len(prices))
+    detector = PromotionDetector().fit(pd.concat([eggs, flat], ignore_index=True))
+
+    kinds = detector.kinds_for(eggs)
+    assert kinds.iloc[10] == PROMOTION
+    assert all(kind is None for i, kind in enumerate(kinds) if i != 10)
+    assert all(kind is None for kind in detector.kinds_for(flat))